@@ -0,0 +1,179 @@
+import os
+# no tk window is opened in batch mode, this has to be set before any plotting module is imported
+os.environ.setdefault("GRAPHVIEW_BACKEND", "Agg")
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import matplotlib.pyplot as plt
+from catalog import find_test_dirs
+from csv_analyzer_graph import CsvAnalyzer, CSV_PLOTS
+from runtime_graph import plot_runtime, PlotType as PlotTypeRuntime
+from distribution_graph import plot_distribution_graph, PlotType as PlotTypeDistribution
+from graph_utils import extract_sorted_values, list_folders
+
+MANIFEST_FILE = "render_manifest.json"
+BATCH_CSV_PLOTS = ["compare_dvl_fp", "ci_vs_rt_fp", "buffer_vs_container"]
+DISTRIBUTION_PLOTS = {"box": PlotTypeDistribution.BOX_PLOT, "violin": PlotTypeDistribution.VIOLIN_PLOT}
+
+
+def input_files(folder_paths, extension):
+    files = []
+    for folder_path in folder_paths:
+        for dir_path, _, file_names in os.walk(folder_path):
+            for file_name in file_names:
+                if file_name.endswith(extension):
+                    stat = os.stat(os.path.join(dir_path, file_name))
+                    files.append((os.path.join(dir_path, file_name), stat.st_size, stat.st_mtime_ns))
+    return sorted(files)
+
+
+# a figure is only rendered again if one of its input files (or the plot parameters) changed
+def fingerprint(files, *params):
+    digest = hashlib.sha1(repr(params).encode())
+    for file in files:
+        digest.update(repr(file).encode())
+    return digest.hexdigest()
+
+
+def save_figure(fig, out_stem, formats):
+    os.makedirs(os.path.dirname(out_stem), exist_ok=True)
+    paths = []
+    for fmt in formats:
+        path = f"{out_stem}.{fmt}"
+        fig.savefig(path, bbox_inches="tight")
+        paths.append(path)
+    plt.close(fig)
+    return paths
+
+
+# collects the figures of one *_tests folder as (kind, base_path, name, params, figures)
+# where figures is a list of (key, value, fingerprint)
+def plan_jobs(root, out_dir, base_path):
+    folders = list_folders(base_path)
+    out_prefix = os.path.join(out_dir, os.path.relpath(base_path, root))
+    jobs = []
+
+    out_files = input_files([os.path.join(base_path, f) for f in folders], ".out")
+    if out_files:
+        jobs.append(("runtime", base_path, "runtime", folders,
+                     [(os.path.join(out_prefix, "runtime"), None, fingerprint(out_files, folders))]))
+
+        if "Percentage" in base_path:
+            for name in DISTRIBUTION_PLOTS:
+                jobs.append(("distribution", base_path, name, folders,
+                             [(os.path.join(out_prefix, f"distribution_{name}"), None,
+                               fingerprint(out_files, folders, name))]))
+
+    if "Percentage" not in base_path:
+        for name in BATCH_CSV_PLOTS:
+            plot_folders = CSV_PLOTS[name][4]
+            if not all(folder in folders for folder in plot_folders):
+                continue
+
+            prefix = "frequency" if "frequency" in base_path else "iteration"
+            figures = []
+            for value in extract_sorted_values(os.path.join(base_path, plot_folders[0])):
+                value_paths = [os.path.join(base_path, folder, f"{prefix}_{value}") for folder in plot_folders]
+                csv_files = input_files(value_paths, ".csv")
+                if csv_files:
+                    figures.append((os.path.join(out_prefix, name, f"{name}_{value}"), value,
+                                    fingerprint(csv_files, name, CSV_PLOTS[name][0], CSV_PLOTS[name][3])))
+            if figures:
+                jobs.append(("csv", base_path, name, None, figures))
+
+    return jobs
+
+
+# runs in a worker process
+def render_job(kind, base_path, name, params, figures, formats):
+    outputs = []
+
+    if kind == "runtime":
+        fig = plot_runtime(base_path, PlotTypeRuntime.SCATTER_PLOT, params, show=False)
+        outputs.append((figures[0][0], save_figure(fig, figures[0][0], formats)))
+
+    elif kind == "distribution":
+        fig = plot_distribution_graph(base_path, DISTRIBUTION_PLOTS[name], params, show=False)
+        outputs.append((figures[0][0], save_figure(fig, figures[0][0], formats)))
+
+    elif kind == "csv":
+        analyzer = CsvAnalyzer(base_path, *CSV_PLOTS[name])
+        try:
+            for key, value, _ in figures:
+                fig = plt.figure(figsize=(15, 9))
+                analyzer.render(value, fig)
+                outputs.append((key, save_figure(fig, key, formats)))
+        finally:
+            analyzer.loader.shutdown(wait=False, cancel_futures=True)
+            analyzer.cache.close()
+
+    else:
+        raise ValueError(f"No such render job as {kind}")
+
+    return outputs
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_FILE), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+# renders every figure of every frequency_tests / iteration_tests folder below root into out_dir
+# (mirroring the experiment tree), spread over a process pool
+def render_all(root, out_dir, formats=("png",), workers=None, force=False):
+    root = os.path.abspath(root)
+    out_dir = os.path.abspath(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+
+    jobs = []
+    skipped = 0
+    for base_path in sorted(find_test_dirs(root)):
+        for kind, job_base_path, name, params, figures in plan_jobs(root, out_dir, base_path):
+            stale = [figure for figure in figures
+                     if force or manifest.get(os.path.relpath(figure[0], out_dir), {}).get("fingerprint") != figure[2]
+                     or not all(os.path.isfile(f"{figure[0]}.{fmt}") for fmt in formats)]
+            skipped += len(figures) - len(stale)
+            if stale:
+                jobs.append((kind, job_base_path, name, params, stale))
+
+    print(f"Rendering {sum(len(job[4]) for job in jobs)} figures in {len(jobs)} jobs, {skipped} are up to date")
+
+    rendered = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(render_job, *job, formats): job for job in jobs}
+        for future in as_completed(futures):
+            kind, base_path, name, _, figures = futures[future]
+            try:
+                outputs = dict(future.result())
+            except Exception as e:
+                print(f"Error rendering {name} in {base_path}: {e}")
+                continue
+
+            for key, _, figure_fingerprint in figures:
+                if key in outputs:
+                    manifest[os.path.relpath(key, out_dir)] = {"fingerprint": figure_fingerprint,
+                                                               "files": outputs[key]}
+                    rendered += 1
+
+            save_manifest(out_dir, manifest)
+
+    print(f"Rendered {rendered} figures into {out_dir}")
+    return manifest
+
+
+if __name__ == "__main__":
+
+    root = ""
+    out_dir = "figures"
+    render_all(root, out_dir, formats=("png", "pdf"))
@@ -0,0 +1,300 @@
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import tempfile
+import platform
+import argparse
+import tracemalloc
+import subprocess
+
+# the figures are only rendered, never shown
+os.environ.setdefault("GRAPHVIEW_BACKEND", "Agg")
+
+from graph_utils import read_slurm, read_and_process_csv, get_plotting_data, extract_sorted_values, list_folders, \
+    SLURM_CACHE_FILE
+from experiment_fs import get_fs
+from csv_io import sidecar_path, pyramid_path
+from synthetic_tree import generate_tree, is_synthetic_tree
+
+PLOT_COLUMNS = ['Iteration', 'computeInteractions[ns]', 'remainderTraversal[ns]']
+AVG_WINDOW = 100
+
+
+class Stage:
+    # run() does the measured work, setup() runs before every repetition outside of the measurement
+    # (e.g. to drop a cache). files, rows and size are the inputs one run reads, for the throughput
+    def __init__(self, name, run, files, rows, size, setup=None):
+        self.name = name
+        self.run = run
+        self.files = files
+        self.rows = rows
+        self.size = size
+        self.setup = setup
+
+    # best time of `repeat` runs, the peak memory is measured in an extra run as tracemalloc slows everything down
+    def measure(self, repeat):
+        times = []
+        for _ in range(repeat):
+            if self.setup is not None:
+                self.setup()
+            start = time.perf_counter()
+            self.run()
+            times.append(time.perf_counter() - start)
+
+        if self.setup is not None:
+            self.setup()
+        tracemalloc.start()
+        try:
+            self.run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        seconds = min(times)
+        return {
+            "stage": self.name,
+            "seconds": seconds,
+            "seconds_all": times,
+            "files": self.files,
+            "rows": self.rows,
+            "bytes": self.size,
+            "files_per_s": self.files / seconds if seconds > 0 else None,
+            "rows_per_s": self.rows / seconds if seconds > 0 else None,
+            "mb_per_s": self.size / 1e6 / seconds if seconds > 0 else None,
+            "peak_mb": peak / 1e6,
+        }
+
+
+def list_files(base_path, suffix):
+    return sorted(glob.glob(os.path.join(base_path, "*", "*", "*" + suffix)))
+
+
+def total_size(paths):
+    return sum(os.path.getsize(path) for path in paths)
+
+
+def count_rows(paths):
+    rows = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            rows += sum(1 for _ in f) - 1
+    return rows
+
+
+def remove_slurm_cache(base_path):
+    path = os.path.join(get_fs(base_path).cache_dir(base_path), SLURM_CACHE_FILE)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def remove_csv_caches(csv_files):
+    for csv_path in csv_files:
+        for path in [sidecar_path(csv_path), pyramid_path(csv_path, PLOT_COLUMNS)]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# percentage experiments read every repetition of a value, the others only the oldest log
+def slurm_stages(base_path, folders, is_percentage):
+    out_files = list_files(base_path, ".out")
+    files, size = len(out_files), total_size(out_files)
+    if not is_percentage:
+        files = len(glob.glob(os.path.join(base_path, "*", "*")))
+        size = total_size([min(glob.glob(os.path.join(value_path, "*.out")))
+                           for value_path in glob.glob(os.path.join(base_path, "*", "*"))])
+    suffix = " [percentage]" if is_percentage else ""
+
+    return [
+        Stage("read_slurm (no cache)" + suffix, lambda: read_slurm(folders, base_path, is_percentage, is_percentage, False),
+              files, 0, size),
+        Stage("read_slurm (cold cache)" + suffix, lambda: read_slurm(folders, base_path, is_percentage, is_percentage),
+              files, 0, size, setup=lambda: remove_slurm_cache(base_path)),
+        Stage("read_slurm (warm cache)" + suffix, lambda: read_slurm(folders, base_path, is_percentage, is_percentage),
+              files, 0, size),
+    ]
+
+
+def csv_stages(base_path, folders):
+    csv_files = list_files(base_path, ".csv")
+    files, rows, size = len(csv_files), count_rows(csv_files), total_size(csv_files)
+    mode = 0 if "frequency" in base_path else 1
+    points = [(folder, value) for folder in folders for value in extract_sorted_values(os.path.join(base_path, folder))]
+
+    def process_all(**kwargs):
+        return lambda: [read_and_process_csv(path, PLOT_COLUMNS, AVG_WINDOW, **kwargs) for path in csv_files]
+
+    return [
+        Stage("read_and_process_csv (pandas)", process_all(use_sidecar=False), files, rows, size),
+        Stage("read_and_process_csv (chunked)", process_all(chunksize=100_000), files, rows, size),
+        Stage("read_and_process_csv (cold sidecar)", process_all(), files, rows, size,
+              setup=lambda: remove_csv_caches(csv_files)),
+        Stage("read_and_process_csv (warm sidecar)", process_all(), files, rows, size),
+        Stage("get_plotting_data",
+              lambda: [get_plotting_data(base_path, folder, value, PLOT_COLUMNS, mode, AVG_WINDOW)
+                       for folder, value in points],
+              files, rows, size),
+    ]
+
+
+def plot_stages(normal_base_path, percentage_base_path):
+    import matplotlib.pyplot as plt
+    from runtime_graph import plot_runtime, PlotType as RuntimePlotType
+    from distribution_graph import plot_distribution_graph, PlotType as DistributionPlotType
+    from csv_analyzer_graph import CsvAnalyzer, CSV_PLOTS
+
+    # rendering to a buffer, the figures are closed so the memory of one run does not add up
+    def render(make_figure):
+        def run():
+            fig = make_figure()
+            fig.canvas.draw()
+            plt.close(fig)
+        return run
+
+    stages = []
+    out_files = list_files(normal_base_path, ".out")
+    for plot_type in RuntimePlotType:
+        stages.append(Stage(f"plot_runtime ({plot_type.name.lower()})",
+                            render(lambda plot_type=plot_type: plot_runtime(normal_base_path, plot_type, show=False)),
+                            len(out_files), 0, total_size(out_files)))
+
+    out_files = list_files(percentage_base_path, ".out")
+    for plot_type in DistributionPlotType:
+        stages.append(Stage(f"plot_distribution_graph ({plot_type.name.lower()})",
+                            render(lambda plot_type=plot_type: plot_distribution_graph(percentage_base_path, plot_type,
+                                                                                  show=False)),
+                            len(out_files), 0, total_size(out_files)))
+
+    # the double plot of the largest value, which loads one csv per folder
+    columns, plot_info, plot_type, avg_window, folders = CSV_PLOTS["compare_dvl_fp"]
+    value = extract_sorted_values(os.path.join(normal_base_path, folders[0]))[-1]
+    csv_files = [path for path in list_files(normal_base_path, ".csv") if f"_{value}{os.sep}" in path]
+
+    def render_csv():
+        analyzer = CsvAnalyzer(normal_base_path, columns, plot_info, plot_type, avg_window, folders)
+        fig = plt.figure(figsize=(15, 9))
+        try:
+            analyzer.render(value, fig)
+            fig.canvas.draw()
+        finally:
+            plt.close(fig)
+            analyzer.loader.shutdown(wait=True, cancel_futures=True)
+            analyzer.cache.close()
+
+    stages.append(Stage("CsvAnalyzer.render", render_csv, len(csv_files), count_rows(csv_files),
+                        total_size(csv_files)))
+    return stages
+
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    previous = {}
+    if baseline is not None:
+        previous = {result["stage"]: result for result in baseline["results"]}
+
+    print(f"{'stage':<42}{'seconds':>10}{'files/s':>12}{'rows/s':>14}{'MB/s':>10}{'peak MB':>10}"
+          + (f"{'vs base':>10}" if previous else ""))
+    for result in results:
+        # stages that read no rows (or bytes) get no rate
+        def rate(key, digits):
+            return f"{result[key]:.{digits}f}" if result[key] else "-"
+
+        line = (f"{result['stage']:<42}{result['seconds']:>10.4f}{rate('files_per_s', 1):>12}"
+                f"{rate('rows_per_s', 0):>14}{rate('mb_per_s', 1):>10}{result['peak_mb']:>10.1f}")
+        if result["stage"] in previous:
+            # > 1 means slower than the baseline
+            line += f"{result['seconds'] / previous[result['stage']]['seconds']:>9.2f}x"
+        print(line)
+
+
+# generates a synthetic tree (unless --tree points at an existing one), times every stage and writes the
+# results as json. a results file of an older version can be passed with --compare to see regressions
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the slurm / csv reading and plotting paths.")
+    parser.add_argument("--root", help="folder to generate the experiment tree in (default: a new temporary folder, "
+                                       "removed afterwards). an existing folder is only replaced if it was generated")
+    parser.add_argument("--tree", help="benchmark an existing tree (the folder with NormalExperiments) instead")
+    parser.add_argument("--values", type=int, default=20, help="number of frequencies per folder")
+    parser.add_argument("--repeats", type=int, default=5, help="runs per frequency of the percentage experiments")
+    parser.add_argument("--rows", type=int, default=10000, help="rows per csv file")
+    parser.add_argument("--log-lines", type=int, default=1000, help="lines per slurm log")
+    parser.add_argument("--repeat", type=int, default=3, help="timed repetitions of every stage")
+    parser.add_argument("--skip-plots", action="store_true")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="results json of an earlier run")
+    args = parser.parse_args()
+
+    params = {key: getattr(args, key) for key in ["values", "repeats", "rows", "log_lines", "repeat"]}
+    temporary_root = None
+    if args.tree is None:
+        root = args.root
+        if root is None:
+            root = temporary_root = tempfile.mkdtemp(prefix="graphview_benchmark_")
+        elif os.path.exists(root) and os.listdir(root):
+            # never delete real experiment data
+            if not is_synthetic_tree(root):
+                print(f"{root} exists and was not generated by synthetic_tree.py, choose another --root")
+                sys.exit(1)
+            shutil.rmtree(root)
+        start = time.perf_counter()
+        normal_base_path = generate_tree(root, "NormalExperiments", num_values=args.values, rows=args.rows,
+                                         log_lines=args.log_lines)
+        percentage_base_path = generate_tree(root, "PercentageExperiments", num_values=args.values,
+                                             repeats=args.repeats, rows=0, log_lines=args.log_lines)
+        print(f"Generated {root} in {time.perf_counter() - start:.1f}s")
+        tree = root
+    else:
+        tree = args.tree
+        normal_base_path = glob.glob(os.path.join(tree, "NormalExperiments", "*", "*", "frequency_tests"))[0]
+        percentage_base_path = glob.glob(os.path.join(tree, "PercentageExperiments", "*", "*", "frequency_tests"))[0]
+        params = {"tree": os.path.abspath(tree), "repeat": args.repeat}
+
+    normal_folders = list_folders(normal_base_path)
+    stages = [Stage("extract_sorted_values",
+                    lambda: [extract_sorted_values(os.path.join(normal_base_path, f)) for f in normal_folders],
+                    len(glob.glob(os.path.join(normal_base_path, "*", "*"))), 0, 0)]
+    stages += slurm_stages(normal_base_path, normal_folders, False)
+    stages += slurm_stages(percentage_base_path, list_folders(percentage_base_path), True)
+    stages += csv_stages(normal_base_path, normal_folders)
+    if not args.skip_plots:
+        stages += plot_stages(normal_base_path, percentage_base_path)
+
+    results = []
+    try:
+        for stage in stages:
+            print(f"Running {stage.name}...", file=sys.stderr)
+            results.append(stage.measure(args.repeat))
+    finally:
+        if temporary_root is not None:
+            shutil.rmtree(temporary_root, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    report = {
+        "version": git_version(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
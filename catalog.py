@@ -0,0 +1,253 @@
+import os
+import re
+import sqlite3
+import numpy as np
+from graph_utils import SlurmCache, slurm_file_pattern, slurm_patterns, parse_slurm_files, read_slurm_keys
+from run_table import RunTable
+
+CATALOG_FILE = "experiments_catalog.sqlite"
+CATEGORIES = ["NormalExperiments", "PercentageExperiments", "CheckpointExperiments"]
+
+sweep_folder_pattern = re.compile(r"^(frequency|iteration)_(\d+)$")
+
+SCHEMA = """
+CREATE TABLE tests (
+    base_path TEXT PRIMARY KEY,
+    category TEXT,
+    scenario TEXT,
+    container TEXT,
+    test_type TEXT,
+    yaml_path TEXT
+);
+CREATE TABLE runs (
+    id INTEGER PRIMARY KEY,
+    base_path TEXT NOT NULL,
+    category TEXT,
+    scenario TEXT,
+    container TEXT,
+    test_type TEXT,
+    variant TEXT NOT NULL,
+    sweep_folder TEXT NOT NULL,
+    sweep_value INTEGER NOT NULL,
+    log_value INTEGER,
+    slurm_id INTEGER,
+    out_path TEXT,
+    csv_path TEXT,
+    wall_time_ns INTEGER
+);
+CREATE INDEX runs_by_test ON runs (base_path, variant, sweep_value, slurm_id);
+CREATE INDEX runs_by_scenario ON runs (scenario, container, test_type);
+"""
+
+
+# category / scenario / container are taken from the path components above the *_tests folder,
+# e.g. PercentageExperiments/fallingDrop/vlc_c08/frequency_tests
+def describe_test_dir(root, test_path):
+    parts = os.path.relpath(test_path, root).split(os.sep)
+    category = next((part for part in parts if part in CATEGORIES), None)
+    if category is None and os.path.basename(root) in CATEGORIES:
+        category = os.path.basename(root)
+
+    scenario = parts[-3] if len(parts) >= 3 else None
+    container = parts[-2] if len(parts) >= 2 else None
+    test_type = parts[-1].replace("_tests", "")
+    return category, scenario, container, test_type
+
+
+def scan_sweep_folder(sweep_path):
+    out_files = []
+    newest_csv = None
+    newest_mtime = None
+
+    with os.scandir(sweep_path) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(".out"):
+                out_files.append(entry.path)
+            elif entry.name.endswith(".csv"):
+                mtime = entry.stat().st_mtime
+                if newest_mtime is None or mtime > newest_mtime:
+                    newest_csv, newest_mtime = entry.path, mtime
+
+    return sorted(out_files), newest_csv
+
+
+def crawl_test_dir(root, test_path, workers=None):
+    category, scenario, container, test_type = describe_test_dir(root, test_path)
+    pattern, time_pattern = slurm_patterns(test_path)
+    cache = SlurmCache(test_path)
+
+    yaml_path = None
+    parent = os.path.dirname(test_path)
+    with os.scandir(parent) as entries:
+        yaml_files = sorted(entry.path for entry in entries if entry.name.endswith(".yaml"))
+    if yaml_files:
+        yaml_path = yaml_files[0]
+
+    test = (test_path, category, scenario, container, test_type, yaml_path)
+    runs = []
+    out_runs = []
+
+    with os.scandir(test_path) as variants:
+        for variant in variants:
+            if not variant.is_dir():
+                continue
+
+            with os.scandir(variant.path) as sweeps:
+                for sweep in sweeps:
+                    match = sweep_folder_pattern.match(sweep.name)
+                    if not match or not sweep.is_dir():
+                        continue
+
+                    sweep_value = int(match.group(2))
+                    out_files, csv_path = scan_sweep_folder(sweep.path)
+                    row = [test_path, category, scenario, container, test_type, variant.name, sweep.name, sweep_value]
+
+                    if not out_files:
+                        runs.append(tuple(row + [None, None, None, csv_path, None]))
+
+                    for out_path in out_files:
+                        file_match = slurm_file_pattern.search(os.path.basename(out_path))
+                        slurm_id = int(file_match.group(2)) if file_match else None
+                        out_runs.append((row, slurm_id, out_path, csv_path))
+
+    # the logs of the whole test folder are parsed at once, on a worker pool
+    parsed = parse_slurm_files(cache, [run[2] for run in out_runs], pattern, time_pattern, workers)
+    for (row, slurm_id, out_path, csv_path), (log_value, time_ns) in zip(out_runs, parsed):
+        runs.append(tuple(row + [log_value, slurm_id, out_path, csv_path, time_ns]))
+
+    cache.save()
+    return test, runs
+
+
+def find_test_dirs(path):
+    test_dirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            if entry.name.endswith("_tests"):
+                test_dirs.append(entry.path)
+            else:
+                test_dirs.extend(find_test_dirs(entry.path))
+    return test_dirs
+
+
+# one pass over the whole experiment tree (NormalExperiments, PercentageExperiments, CheckpointExperiments)
+# writing one row per slurm run into a sqlite file, the catalog is rebuilt from scratch on every crawl
+def build_catalog(root, catalog_path=None, workers=None):
+    root = os.path.abspath(root)
+    if catalog_path is None:
+        catalog_path = os.path.join(root, CATALOG_FILE)
+
+    tests = []
+    runs = []
+    for test_path in sorted(find_test_dirs(root)):
+        test, test_runs = crawl_test_dir(root, test_path, workers)
+        tests.append(test)
+        runs.extend(test_runs)
+
+    tmp_path = catalog_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    connection = sqlite3.connect(tmp_path)
+    with connection:
+        connection.executescript(SCHEMA)
+        connection.executemany("INSERT INTO tests VALUES (?, ?, ?, ?, ?, ?)", tests)
+        connection.executemany(
+            "INSERT INTO runs (base_path, category, scenario, container, test_type, variant, sweep_folder, "
+            "sweep_value, log_value, slurm_id, out_path, csv_path, wall_time_ns) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", runs)
+    connection.close()
+    os.replace(tmp_path, catalog_path)
+
+    print(f"Catalog {catalog_path}: {len(tests)} test folders, {len(runs)} runs")
+    return Catalog(catalog_path)
+
+
+class Catalog:
+    def __init__(self, catalog_path):
+        if not os.path.isfile(catalog_path):
+            raise FileNotFoundError(f"No catalog found at {catalog_path}, build it with build_catalog first")
+        self.path = catalog_path
+        self.connection = sqlite3.connect(catalog_path, check_same_thread=False)
+
+    def query(self, sql, params=()):
+        return self.connection.execute(sql, params).fetchall()
+
+    def test_dirs(self, category=None, scenario=None, container=None, test_type=None):
+        filters = {"category": category, "scenario": scenario, "container": container, "test_type": test_type}
+        clauses = [f"{key} = ?" for key, value in filters.items() if value is not None]
+        params = [value for value in filters.values() if value is not None]
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return [row[0] for row in self.query(f"SELECT base_path FROM tests{where} ORDER BY base_path", params)]
+
+    def folders(self, base_path):
+        rows = self.query("SELECT DISTINCT variant FROM runs WHERE base_path = ? ORDER BY variant",
+                          (os.path.abspath(base_path),))
+        return [row[0] for row in rows]
+
+    def find_yaml(self, base_path):
+        rows = self.query("SELECT yaml_path FROM tests WHERE base_path = ?", (os.path.abspath(base_path),))
+        if not rows or rows[0][0] is None:
+            raise Exception(f"No Yaml File was Found in {base_path}")
+        return os.path.basename(rows[0][0]), rows[0][0]
+
+    def extract_sorted_values(self, base_path, folder):
+        rows = self.query("SELECT DISTINCT sweep_value FROM runs WHERE base_path = ? AND variant = ? "
+                          "ORDER BY sweep_value", (os.path.abspath(base_path), folder))
+        return [row[0] for row in rows]
+
+    def get_newest_csv(self, base_path, folder, value):
+        rows = self.query("SELECT csv_path FROM runs WHERE base_path = ? AND variant = ? AND sweep_value = ? "
+                          "AND csv_path IS NOT NULL LIMIT 1", (os.path.abspath(base_path), folder, value))
+        return rows[0][0] if rows else None
+
+    # same output as graph_utils.read_slurm, without touching the experiment tree.
+    # other fields than the sweep value and wall-clock time (x_key / y_key) are read from the logs,
+    # on a pool of `workers` threads or processes (see graph_utils.parse_slurm_files)
+    def read_slurm(self, folders, base_path, is_percentage, is_distribution_plot, x_key=None, y_key=None,
+                   workers=None, executor="thread"):
+        base_path = os.path.abspath(base_path)
+
+        sweep_folder = []
+        file_point, file_value, file_time_s, file_valid, out_paths = [], [], [], [], []
+        for folder_code, folder in enumerate(folders):
+            rows = self.query("SELECT sweep_folder, log_value, slurm_id, wall_time_ns, out_path FROM runs "
+                              "WHERE base_path = ? AND variant = ? AND out_path IS NOT NULL "
+                              "ORDER BY sweep_value, slurm_id", (base_path, folder))
+
+            runs_per_sweep = {}
+            for sweep_folder_name, log_value, slurm_id, time_ns, out_path in rows:
+                if is_percentage or slurm_id is not None:
+                    runs_per_sweep.setdefault(sweep_folder_name, []).append((log_value, time_ns, out_path))
+
+            for runs in runs_per_sweep.values():
+                if not is_percentage:
+                    # only the oldest run (smallest slurm id) of a sweep point is used
+                    runs = runs[:1]
+
+                for log_value, time_ns, out_path in runs:
+                    valid = log_value is not None and time_ns is not None
+                    file_point.append(len(sweep_folder))
+                    file_value.append(log_value if valid else -1)
+                    file_time_s.append(time_ns / 1e9 if valid else 0)
+                    file_valid.append(valid)
+                    out_paths.append(out_path)
+                sweep_folder.append(folder_code)
+
+        if x_key is not None or y_key is not None:
+            cache = SlurmCache(base_path)
+            file_value, file_time_s, file_valid = read_slurm_keys(cache, out_paths, base_path, x_key, y_key, workers,
+                                                                  executor)
+            cache.save()
+
+        return RunTable.from_parsed(folders, sweep_folder, file_point, file_value, file_time_s,
+                                    np.array(file_valid, dtype=bool), is_distribution_plot)
+
+if __name__ == "__main__":
+
+    root = ""
+    build_catalog(root)
@@ -1,19 +1,29 @@
-import matplotlib
 import os
-matplotlib.use('TkAgg')
 from enum import Enum
-import tkinter as tk
-from tkinter import ttk
+import threading
+from graph_utils import PlotInfo, get_plotting_data, generate_distinct_colors, extract_sorted_values, map_folders_to_colors, \
+    get_newest_csv, use_backend
+use_backend()
 import matplotlib.pyplot as plt
 from matplotlib.ticker import ScalarFormatter
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-from graph_utils import PlotInfo, get_plotting_data, generate_distinct_colors, extract_sorted_values, map_folders_to_colors
+from concurrent.futures import ThreadPoolExecutor
+from csv_io import CsvTail
+from frame_cache import FrameCache, DEFAULT_CACHE_BYTES
+from decimation import DecimatedLine
+from profiling import span, trace_draws
 
 
 fig = None
 canvas = None
 toolbar = None
 
+AVG_WINDOW_CHOICES = [1, 10, 100, 1000, 10000]
+
+# how often the tk main loop checks whether the data of the selected value has been loaded
+POLL_INTERVAL_MS = 50
+# how often the csv files of the selected value are checked for new rows in live mode
+LIVE_INTERVAL_MS = 2000
+
 
 class PlotType(Enum):
     # one column in one plot for 2 branches and one in another plot for the 2 branches
@@ -22,11 +32,36 @@ class PlotType(Enum):
     SINGLE_PLOT = 2
 
 
+# (columns, plot info, plot type, avg_window, folders) of the csv plots offered in main.py and rendered in batch mode
+CSV_PLOTS = {
+    # Compare Compute Interactions in DVL and FP
+    # Compare Remainder Traversal in DVL and FP
+    "compare_dvl_fp": (['Iteration', 'computeInteractions[ns]', 'remainderTraversal[ns]'],
+                       PlotInfo('Iteration', 'Time [ns]', 'Graph'), PlotType.DOUBLE_PLOT, 100,
+                       ["fastParticleBuffer", "dynamicVLMerge"]),
+    # Compute Interactions vs Remainder Traversal in Fast Particle Buffer
+    "ci_vs_rt_fp": (['Iteration', 'remainderTraversal[ns]', 'computeInteractions[ns]'],
+                    PlotInfo('Iteration', 'Time [ns]', 'Graph'), PlotType.SINGLE_PLOT, 100,
+                    ["fastParticleBuffer", "dynamicVLMerge"]),
+    # Number of Particles in Buffer vs in Container in FastParticleBuffer
+    "buffer_vs_container": (['Iteration', 'particleBufferSize', 'numberOfParticlesInContainer'],
+                            PlotInfo('Iteration', 'Number of Particles in Buffer', 'Graph'), PlotType.SINGLE_PLOT, 1,
+                            ["fastParticleBuffer"]),
+    # Number of Fast Particles found every Iteration in FastParticleBuffer
+    "fast_particles": (['Iteration', 'numberFastParticles'],
+                       PlotInfo('Iteration', 'particleBufferSize', 'Graph'), PlotType.SINGLE_PLOT, 1,
+                       ["fastParticleBuffer"]),
+}
+
+
 class CsvAnalyzer:
 
-    def __init__(self, base_path, columns, plot_info: PlotInfo, plot_type: PlotType, avg_window, folders):
+    # live: follow csv files that are still being written, only the appended rows are read on every refresh
+    def __init__(self, base_path, columns, plot_info: PlotInfo, plot_type: PlotType, avg_window, folders, catalog=None,
+                 cache_bytes=DEFAULT_CACHE_BYTES, prefetch_distance=1, live=False):
 
         self.base_path = base_path
+        self.catalog = catalog
         self.columns = columns
         self.avg_window = avg_window
 
@@ -44,13 +79,116 @@ class CsvAnalyzer:
         # else:
         #     self.values = get_frequencies()
 
-        self.values = extract_sorted_values(os.path.join(base_path, folders[0]))
-
-
+        if catalog is not None:
+            self.values = catalog.extract_sorted_values(base_path, folders[0])
+        else:
+            self.values = extract_sorted_values(os.path.join(base_path, folders[0]))
+
+        # processed frames of recently shown values, the neighbouring values are prefetched in the background
+        self.cache = FrameCache(cache_bytes)
+        self.prefetch_distance = prefetch_distance
+
+        # data is loaded on worker threads, only the most recent selection is ever drawn
+        self.loader = ThreadPoolExecutor(max_workers=2, thread_name_prefix="loader")
+        self.pending_load = None
+        self.generation = 0
+        self.window = None
+        self.progress = None
+        self.status_var = None
+        self.selected_value = None
+
+        # every series is drawn decimated to the current zoom level, the full resolution stays in here
+        self.decimated_lines = []
+        self.series = []
+        self.axes = []
+        self.layout_fig = None
+        self.background = None
+        self.capturing_background = False
+        self.drawn_limits = None
+        self.shown_value = None
+
+        self.live = live
+        self.tails = {}
+        self.tails_lock = threading.Lock()
+
+    def cache_key(self, folder, value, avg_window):
+        return folder, value, tuple(self.columns), avg_window
+
+    # the window is passed in instead of read from self.avg_window, a prefetch that runs after the window
+    # was changed still loads the data of the key it was submitted with
+    def load_data(self, folder, value, avg_window):
+        with span("csv_analyzer.load", folder=folder, value=value):
+            return get_plotting_data(self.base_path, folder, value, self.columns, self.mode, avg_window, self.catalog)
+
+    # the windowed means of the newest csv of a run that is still being written
+    def tail_data(self, folder, value, avg_window):
+        name = "frequency" if self.mode == 0 else "iteration"
+        if self.catalog is not None:
+            csv_path = self.catalog.get_newest_csv(self.base_path, folder, value)
+        else:
+            csv_path = get_newest_csv(os.path.join(self.base_path, folder, f'{name}_{value}'))
+        if csv_path is None:
+            raise TypeError(f'No .csv file in {os.path.join(self.base_path, folder, f"{name}_{value}")}')
+
+        with self.tails_lock:
+            key = self.cache_key(folder, value, avg_window)
+            tail = self.tails.get(key)
+            if tail is None or tail.csv_path != csv_path:
+                tail = self.tails[key] = CsvTail(csv_path, self.columns, avg_window)
+            with span("csv_analyzer.tail", folder=folder, value=value):
+                tail.update()
+                return tail.result()
+
+    def get_data(self, folder, value, avg_window):
+        if self.live:
+            return self.tail_data(folder, value, avg_window)
+        return self.cache.get_or_load(self.cache_key(folder, value, avg_window),
+                                      lambda: self.load_data(folder, value, avg_window))
+
+    def prefetch_neighbours(self, value):
+        # live data changes all the time, it is not worth keeping
+        if self.live or value not in self.values:
+            return
 
-    def plot_single(self, value):
-        global fig, canvas
+        index = self.values.index(value)
+        avg_window = self.avg_window
+        for distance in range(1, self.prefetch_distance + 1):
+            for neighbour_index in (index + distance, index - distance):
+                if 0 <= neighbour_index < len(self.values):
+                    neighbour = self.values[neighbour_index]
+                    for folder in self.folders:
+                        self.cache.prefetch(self.cache_key(folder, neighbour, avg_window),
+                                            lambda folder=folder, neighbour=neighbour:
+                                            self.load_data(folder, neighbour, avg_window))
+
+    def load_value(self, value, avg_window):
+        return {folder: self.get_data(folder, value, avg_window) for folder in self.folders}
+
+
+    # the axes, lines, legends and formatting are created once per figure,
+    # selecting another value only replaces the data of the existing lines
+    def layout_ready(self):
+        return self.layout_fig is fig
+
+    def add_series(self, ax, folder, column, **kwargs):
+        line, = ax.plot([], [], **kwargs)
+        self.decimated_lines.append(DecimatedLine(ax, line, [], []))
+        self.series.append((folder, column, self.decimated_lines[-1]))
+
+    def reset_layout(self):
+        for decimated_line in self.decimated_lines:
+            decimated_line.disconnect()
+        self.decimated_lines = []
+        self.series = []
+        self.background = None
         fig.clf()  # Clear the figure to start fresh
+        self.layout_fig = fig
+        self.axes = []
+        fig.canvas.mpl_connect('draw_event', self.on_draw)
+        trace_draws(fig, "csv_analyzer.draw")
+
+    def build_single_layout(self):
+        self.reset_layout()
 
         len_columns = len(self.columns)
         len_folders = len(self.folders)
@@ -64,24 +202,18 @@ class CsvAnalyzer:
         color_flag = len_columns < 2 and set(self.folders).issubset(["fastParticleBuffer", "dynamicVLMerge"])
 
         ax = fig.add_subplot(111)
+        self.axes = [ax]
         counter = 0
         for i in range(0, len_folders):
 
             folder = self.folders[i]
-            data = get_plotting_data(self.base_path, folder, value, self.columns, self.mode,
-                                                   self.avg_window)
-
 
             for j in range(1, len_columns): #the first column is the iteration column which is basically the x-axis
 
                 color = folder_colors[folder] if color_flag else random_colors[counter]
-                ax.plot(data[self.columns[0]], data[self.columns[j]],
-                        label=f"{folder} - {self.columns[j]}", color=color)
+                self.add_series(ax, folder, self.columns[j], label=f"{folder} - {self.columns[j]}", color=color)
                 counter += 1
 
-        # ax.plot(fast_particle_data[self.columns[0]], fast_particle_data[self.columns[2]],
-        #         label=self.columns[2], color="r")
-
         # ax.set_title('Fast Particle Buffer')
         ax.set_xlabel(self.plot_info.x_label, fontsize=18)
         ax.set_ylabel(self.plot_info.y_label, fontsize=18)
@@ -89,68 +221,132 @@ class CsvAnalyzer:
         ax.legend(fontsize=14)
         ax.grid(True)
 
-        canvas.draw()
-
-    def plot_double(self, value):
-        global fig, canvas
-        fig.clf()  # Clear the figure
+    def build_double_layout(self):
+        self.reset_layout()
 
-        len_columns = min(3, len(self.columns))  # Ensure max 2 y-columns + 1 x-column
         len_folders = len(self.folders)
 
-        if len_columns < 2:
-            print("Error: Need at least 2 columns (one X and one Y) for plotting.")
-            return
-
         folder_colors = map_folders_to_colors(self.folders)
         random_colors = generate_distinct_colors(len_folders)  # One color per folder
 
         color_flag = len_folders == 2 and set(self.folders).issubset({"fastParticleBuffer", "dynamicVLMerge"})
 
-        ax1 = plt.subplot(2, 1, 1)
-        ax2 = plt.subplot(2, 1, 2)
+        ax1 = fig.add_subplot(2, 1, 1)
+        ax2 = fig.add_subplot(2, 1, 2)
+        self.axes = [ax1, ax2]
 
         for i, folder in enumerate(self.folders):
-            data = get_plotting_data(self.base_path, folder, value, self.columns, self.mode, self.avg_window)
-
             color = folder_colors[folder] if color_flag else random_colors[i]
 
-            ax1.plot(data[self.columns[0]], data[self.columns[1]],
-                     label=f"{folder} - {self.columns[1]}", color=color)
-
-            ax2.plot(data[self.columns[0]], data[self.columns[2]],
-                     label=f"{folder} - {self.columns[2]}", color=color)
+            self.add_series(ax1, folder, self.columns[1], label=f"{folder} - {self.columns[1]}", color=color)
+            self.add_series(ax2, folder, self.columns[2], label=f"{folder} - {self.columns[2]}", color=color)
+
+        for ax in self.axes:
+            ax.legend(fontsize=14)
+            ax.grid(True)
+            ax.set_xlabel(self.columns[0], fontsize=18)
+            ax.set_ylabel(self.plot_info.y_label, fontsize=18)
+            ax.tick_params(axis='both', which='major', labelsize=18)
+            ax.ticklabel_format(style='scientific', axis='y', scilimits=(-2, 2))
+
+    def update_series(self, value, datasets):
+        with span("csv_analyzer.update", value=value):
+            for folder, column, decimated_line in self.series:
+                data = datasets[folder]
+                decimated_line.set_full_data(data[self.columns[0]].to_numpy(), data[column].to_numpy())
+
+            for ax in self.axes:
+                ax.relim()
+                ax.autoscale_view()
+
+        # the home view of the toolbar belongs to the previous value (a live refresh keeps it)
+        if value != self.shown_value and toolbar is not None and toolbar.canvas is canvas:
+            toolbar.update()
+        self.shown_value = value
+
+    def axes_limits(self):
+        return [(tuple(ax.get_xlim()), tuple(ax.get_ylim())) for ax in self.axes]
+
+    def on_draw(self, event):
+        if not self.capturing_background:
+            self.background = None
+
+    # when the limits did not change (e.g. while zoomed in) only the lines are redrawn on top of a
+    # cached background (blitting), otherwise the whole figure is drawn
+    def refresh(self):
+        limits = self.axes_limits()
+        lines = [decimated_line.line for decimated_line in self.decimated_lines]
+
+        if not canvas.supports_blit or limits != self.drawn_limits:
+            self.drawn_limits = limits
+            canvas.draw_idle()
+            return
 
-        # Formatting for ax1
-        ax1.legend(fontsize=14)
-        ax1.grid(True)
-        ax1.set_xlabel(self.columns[0], fontsize=18)
-        ax1.set_ylabel(self.plot_info.y_label, fontsize=18)
-        ax1.tick_params(axis='both', which='major', labelsize=18)
-        ax1.ticklabel_format(style='scientific', axis='y', scilimits=(-2, 2))
+        if self.background is None:
+            self.capturing_background = True
+            for line in lines:
+                line.set_visible(False)
+            canvas.draw()
+            self.background = canvas.copy_from_bbox(fig.bbox)
+            for line in lines:
+                line.set_visible(True)
+            self.capturing_background = False
+
+        with span("csv_analyzer.blit"):
+            canvas.restore_region(self.background)
+            for line in lines:
+                line.axes.draw_artist(line)
+            canvas.blit(fig.bbox)
+
+    def plot_single(self, value, datasets=None):
+        if datasets is None:
+            datasets = self.load_value(value, self.avg_window)
+
+        if not self.layout_ready():
+            self.build_single_layout()
+        self.update_series(value, datasets)
+        self.refresh()
+
+    def plot_double(self, value, datasets=None):
+        if datasets is None:
+            datasets = self.load_value(value, self.avg_window)
 
-        # Formatting for ax2
-        ax2.legend(fontsize=14)
-        ax2.grid(True)
-        ax2.set_xlabel(self.columns[0], fontsize=18)
-        ax2.set_ylabel(self.plot_info.y_label, fontsize=18)
-        ax2.tick_params(axis='both', which='major', labelsize=18)
-        ax2.ticklabel_format(style='scientific', axis='y', scilimits=(-2, 2))
+        len_columns = min(3, len(self.columns))  # Ensure max 2 y-columns + 1 x-column
+        if len_columns < 2:
+            print("Error: Need at least 2 columns (one X and one Y) for plotting.")
+            return
 
-        plt.tight_layout()
-        canvas.draw()
+        if not self.layout_ready():
+            self.build_double_layout()
+            self.update_series(value, datasets)
+            fig.tight_layout()  # needs the tick labels of the first data
+        else:
+            self.update_series(value, datasets)
+        self.refresh()
 
-    def plot(self, value):
+    def plot(self, value, datasets=None):
 
         if self.plot_type == PlotType.SINGLE_PLOT:
-            self.plot_single(value)
+            self.plot_single(value, datasets)
         elif self.plot_type == PlotType.DOUBLE_PLOT:
-            self.plot_double(value)
+            self.plot_double(value, datasets)
         else:
             raise TypeError(f"No such plot type as: {self.plot_type}")
 
+        self.prefetch_neighbours(value)
+
+
+    # draws a value into a figure without a tk window, e.g. for saving it to a file
+    def render(self, value, figure):
+        global fig, canvas
+        fig = figure
+        canvas = figure.canvas
+        self.plot(value)
 
     def create_window(self):
+        import tkinter as tk
+        from tkinter import ttk
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 
         # if "Percentage" in self.base_path:
         #     print("This plot is not available for percentage experiments, please choose runtime plot or distribution plot")
@@ -171,6 +367,25 @@ class CsvAnalyzer:
         dropdown.bind('<<ComboboxSelected>>', lambda event: self.update_plot(dropdown_var.get()))
         dropdown.pack(side=tk.TOP, pady=10)
 
+        # the smoothing can be changed at any time, the windowed means come from the averaging pyramid
+        window_frame = tk.Frame(window)
+        window_frame.pack(side=tk.TOP)
+        ttk.Label(window_frame, text="Average window").pack(side=tk.LEFT, padx=5)
+        avg_window_var = tk.StringVar(window, value=str(self.avg_window))
+        avg_window_box = ttk.Combobox(window_frame, textvariable=avg_window_var, width=8,
+                                      values=[str(w) for w in AVG_WINDOW_CHOICES])
+        avg_window_box.bind('<<ComboboxSelected>>', lambda event: self.set_avg_window(avg_window_var.get()))
+        avg_window_box.bind('<Return>', lambda event: self.set_avg_window(avg_window_var.get()))
+        avg_window_box.pack(side=tk.LEFT)
+
+        self.window = window
+        self.status_var = tk.StringVar(window)
+        status_frame = tk.Frame(window)
+        status_frame.pack(side=tk.TOP)
+        self.progress = ttk.Progressbar(status_frame, mode='indeterminate', length=150)
+        self.progress.pack(side=tk.LEFT, padx=5)
+        ttk.Label(status_frame, textvariable=self.status_var).pack(side=tk.LEFT)
+
         fig = plt.figure(figsize=(15, 9))
         frame = tk.Frame(window)
         frame.pack(fill='both', expand=True, padx=15, pady=15)
@@ -182,15 +397,73 @@ class CsvAnalyzer:
         toolbar.update()
         toolbar.pack(side=tk.BOTTOM, fill=tk.X)
 
-        self.plot(int(dropdown_var.get()))
+        self.update_plot(dropdown_var.get())
+        if self.live:
+            window.after(LIVE_INTERVAL_MS, self.live_refresh)
 
         window.protocol("WM_DELETE_WINDOW", window.quit)
         window.mainloop()
+        self.loader.shutdown(wait=False, cancel_futures=True)
+        self.cache.close()
+
+    def set_avg_window(self, avg_window):
+        try:
+            avg_window = int(avg_window)
+        except ValueError:
+            avg_window = 0
+        if avg_window < 1:
+            self.status_var.set("The average window has to be a positive integer")
+            return
 
-    def update_plot(self, selected_value):
-        global canvas
+        self.avg_window = avg_window
+        # the neighbours queued for the old window are not going to be shown
+        self.cache.cancel_prefetches()
+        with self.tails_lock:
+            self.tails = {}
+        if self.selected_value is not None:
+            self.update_plot(self.selected_value)
+
+    # reloads the selected value (only the new rows of its csv files), unless a load is still running
+    def live_refresh(self):
+        if self.pending_load is None and self.selected_value is not None:
+            self.update_plot(self.selected_value, quiet=True)
+        self.window.after(LIVE_INTERVAL_MS, self.live_refresh)
+
+    def update_plot(self, selected_value, quiet=False):
         selected_value = int(selected_value)
-        self.plot(selected_value)
+        self.selected_value = selected_value
+
+        # a newer selection makes every older request stale, the ones that did not start yet are cancelled
+        self.generation += 1
+        if self.pending_load is not None:
+            self.pending_load.cancel()
+
+        self.pending_load = self.loader.submit(self.load_value, selected_value, self.avg_window)
+        if not quiet:
+            self.status_var.set(f"Loading {selected_value} ...")
+            self.progress.start(10)
+        self.window.after(POLL_INTERVAL_MS, self.poll_load, self.generation, self.pending_load, selected_value)
+
+    # runs on the tk main thread, the worker threads never touch tk or matplotlib
+    def poll_load(self, generation, future, value):
+        if generation != self.generation:
+            return
+        if not future.done():
+            self.window.after(POLL_INTERVAL_MS, self.poll_load, generation, future, value)
+            return
+
+        self.progress.stop()
+        self.pending_load = None
+
+        try:
+            datasets = future.result()
+        except Exception as e:
+            print(f"Error loading {value}: {e}")
+            self.status_var.set(f"Error loading {value}: {e}")
+            return
+
+        self.status_var.set("")
+        self.plot(value, datasets)
 
 if __name__ == "__main__":
 
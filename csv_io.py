@@ -0,0 +1,401 @@
+import io
+import os
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from experiment_fs import get_fs
+from profiling import span, count
+
+SIDECAR_SUFFIX = ".columns.npz"
+SIDECAR_VERSION = 1
+PYRAMID_SUFFIX = ".pyramid"
+PYRAMID_VERSION = 2
+PYRAMID_BASE = 10
+
+
+# archived csv files get their sidecar in the cache folder next to the archive
+def sidecar_path(csv_path):
+    fs = get_fs(csv_path)
+    return os.path.join(fs.cache_dir(os.path.dirname(csv_path)), os.path.basename(csv_path) + SIDECAR_SUFFIX)
+
+
+# one-time conversion of a per-iteration csv into typed columns:
+# rows with missing fields are dropped, every column is coerced to numbers (NaN where invalid)
+# and the rows are stably sorted by Iteration, so the first row of equal iterations is still the first one in the file
+def convert_csv(csv_path):
+    with span("csv.parse"), get_fs(csv_path).open(csv_path) as f:
+        df = pd.read_csv(f, on_bad_lines='skip')
+
+    num_columns = len(df.columns)
+    rows_read = len(df)
+    df = df[df.notnull().sum(axis=1) == num_columns]
+    count("csv_rows_dropped", rows_read - len(df))
+
+    columns = [str(col) for col in df.columns]
+    arrays = []
+    for col in df.columns:
+        values = pd.to_numeric(df[col], errors='coerce')
+        if values.isnull().any() or not pd.api.types.is_integer_dtype(values):
+            arrays.append(values.to_numpy(dtype=np.float64))
+        else:
+            arrays.append(values.to_numpy(dtype=np.int64))
+
+    if "Iteration" in columns:
+        order = np.argsort(arrays[columns.index("Iteration")], kind='stable')
+        arrays = [array[order] for array in arrays]
+
+    return columns, arrays
+
+
+# writes the arrays into a temporary file next to path and renames it, so readers never see a half written file
+def save_npz(path, compress=False, **arrays):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    (np.savez_compressed if compress else np.savez)(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+# the sidecar is compressed, as plain int64 columns it takes more than twice the space of the csv
+def write_sidecar(csv_path, stat, columns, arrays):
+    members = {f"c{i}": array for i, array in enumerate(arrays)}
+    save_npz(sidecar_path(csv_path), compress=True,
+             __columns__=np.array(columns, dtype=str),
+             __source__=np.array([SIDECAR_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64),
+             **members)
+
+
+def open_sidecar(csv_path, stat):
+    path = sidecar_path(csv_path)
+    if not os.path.isfile(path):
+        return None
+
+    try:
+        store = np.load(path)
+        source = store["__source__"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+    if list(source) != [SIDECAR_VERSION, stat.st_size, stat.st_mtime_ns]:
+        store.close()
+        return None
+    return store
+
+
+def clean_columns(columns, arrays, column_names):
+    if not all(col in columns for col in column_names):
+        raise ValueError(f"file doesn't contain the following columns: {column_names}")
+
+    with span("csv.clean"):
+        selected = {col: arrays(col) for col in column_names}
+        iteration = selected["Iteration"] if "Iteration" in selected else arrays("Iteration")
+
+        # remove invalid values
+        mask = np.ones(len(iteration), dtype=bool)
+        for array in selected.values():
+            if array.dtype.kind == 'f':
+                mask &= ~np.isnan(array)
+
+        # drop duplicates (the rows are already sorted by iteration)
+        iteration = iteration[mask]
+        keep = np.ones(len(iteration), dtype=bool)
+        keep[1:] = iteration[1:] != iteration[:-1]
+
+        cleaned = {col: array[mask][keep].astype(np.int64) for col, array in selected.items()}
+
+    kept = int(keep.sum())
+    count("csv_rows_kept", kept)
+    count("csv_rows_dropped", len(mask) - kept)
+    return cleaned
+
+
+# cleaned, sorted and deduplicated int64 columns of a csv. the columnar sidecar next to the csv
+# is (re)built when the csv changed and only the requested columns are read from it afterwards
+def load_columns(csv_path, column_names, use_sidecar=True):
+    stat = get_fs(csv_path).stat(csv_path)
+
+    store = open_sidecar(csv_path, stat) if use_sidecar else None
+    if store is not None:
+        with store:
+            columns = list(store["__columns__"])
+            return clean_columns(columns, lambda col: store[f"c{columns.index(col)}"], column_names)
+
+    columns, arrays = convert_csv(csv_path)
+    count("csv_bytes_read", stat.st_size)
+    if use_sidecar:
+        try:
+            with span("csv.write_sidecar"):
+                write_sidecar(csv_path, stat, columns, arrays)
+        except OSError as e:
+            print(f"Could not write columnar sidecar for {csv_path}: {e}")
+
+    return clean_columns(columns, lambda col: arrays[columns.index(col)], column_names)
+
+
+# mean of every avg_window consecutive rows, the last window may be shorter
+def window_means(columns, column_names, avg_window):
+    num_rows = len(columns[column_names[0]])
+    starts = np.arange(0, num_rows, avg_window)
+    counts = np.diff(np.append(starts, num_rows))
+
+    means = {}
+    with span("csv.aggregate"):
+        for col in column_names:
+            if num_rows == 0:
+                means[col] = np.empty(0, dtype=np.float64)
+            else:
+                means[col] = np.add.reduceat(columns[col], starts) / counts
+    return pd.DataFrame(means, columns=column_names)
+
+
+# averaging pyramid of the cleaned columns: level l >= 1 holds the sums of blocks of PYRAMID_BASE**l rows, level 0
+# are the rows themselves and come from the columnar sidecar. every block holds PYRAMID_BASE**l rows except the last
+# one, so only the number of rows is stored. every window size is answered from the coarsest level whose block size
+# divides it, without going back to the csv. one pyramid holds a set of columns, whatever order they are asked in
+def pyramid_path(csv_path, column_names):
+    digest = hashlib.sha1("\0".join(sorted(set(column_names))).encode()).hexdigest()[:12]
+    return sidecar_path(csv_path)[:-len(SIDECAR_SUFFIX)] + f"{PYRAMID_SUFFIX}.{digest}.npz"
+
+
+# the sums of levels 1, 2, ... until a level has a single block
+def build_pyramid(columns, column_names):
+    levels = []
+    sums = {col: columns[col] for col in column_names}
+    while len(sums[column_names[0]]) > 1:
+        starts = np.arange(0, len(sums[column_names[0]]), PYRAMID_BASE)
+        sums = {col: np.add.reduceat(sums[col], starts) for col in column_names}
+        levels.append(sums)
+    return levels
+
+
+def write_pyramid(path, stat, column_names, levels, num_rows):
+    members = {}
+    for level, sums in enumerate(levels, start=1):
+        for i, col in enumerate(column_names):
+            members[f"l{level}_c{i}"] = sums[col]
+
+    save_npz(path,
+             __columns__=np.array(column_names, dtype=str),
+             __source__=np.array([PYRAMID_VERSION, stat.st_size, stat.st_mtime_ns, len(levels), num_rows],
+                                 dtype=np.int64),
+             **members)
+
+
+# the coarsest of the levels 0..num_levels whose block size divides avg_window
+def pyramid_level(avg_window, num_levels):
+    level = 0
+    while level < num_levels and avg_window % PYRAMID_BASE ** (level + 1) == 0:
+        level += 1
+    return level
+
+
+def pyramid_means(sums, num_rows, column_names, level, avg_window):
+    block_size = PYRAMID_BASE ** level
+    starts = np.arange(0, len(sums[column_names[0]]), avg_window // block_size)
+    counts = np.diff(np.append(starts * block_size, num_rows))
+    means = {}
+    with span("csv.aggregate"):
+        for col in column_names:
+            if num_rows == 0:
+                means[col] = np.empty(0, dtype=np.float64)
+            else:
+                means[col] = np.add.reduceat(sums[col], starts) / counts
+    return pd.DataFrame(means, columns=column_names)
+
+
+# windowed means of the cleaned columns. only the one pyramid level that is needed is read,
+# the pyramid is (re)built from the columnar sidecar when the csv changed
+def load_windowed(csv_path, column_names, avg_window):
+    stat = get_fs(csv_path).stat(csv_path)
+    path = pyramid_path(csv_path, column_names)
+    stored_names = sorted(set(column_names))
+
+    # windows that are not a multiple of a block are averaged from the rows
+    if avg_window % PYRAMID_BASE != 0:
+        return window_means(load_columns(csv_path, stored_names), column_names, avg_window)
+
+    if os.path.isfile(path):
+        try:
+            with np.load(path) as store:
+                source = list(store["__source__"])
+                if source[:3] == [PYRAMID_VERSION, stat.st_size, stat.st_mtime_ns] \
+                        and list(store["__columns__"]) == stored_names:
+                    num_levels, num_rows = source[3:5]
+                    level = pyramid_level(avg_window, num_levels)
+                    if level > 0:
+                        sums = {col: store[f"l{level}_c{stored_names.index(col)}"] for col in column_names}
+                        count("pyramid_bytes_read", sum(array.nbytes for array in sums.values()))
+                        return pyramid_means(sums, num_rows, column_names, level, avg_window)
+                    return window_means(load_columns(csv_path, stored_names), column_names, avg_window)
+        except (OSError, ValueError, KeyError):
+            pass
+
+    columns = load_columns(csv_path, stored_names)
+    num_rows = len(columns[stored_names[0]])
+    with span("csv.build_pyramid"):
+        levels = build_pyramid(columns, stored_names)
+    try:
+        write_pyramid(path, stat, stored_names, levels, num_rows)
+    except OSError as e:
+        print(f"Could not write averaging pyramid for {csv_path}: {e}")
+
+    level = pyramid_level(avg_window, len(levels))
+    sums = levels[level - 1] if level > 0 else columns
+    return pyramid_means(sums, num_rows, column_names, level, avg_window)
+
+
+# incremental version of the cleaning, deduplication, sorting and window averaging for rows arriving in chunks.
+# the newest `holdback` rows stay pending so rows that are slightly out of order can still be sorted in,
+# anything older than the last emitted iteration is treated as a duplicate of an already emitted row
+class WindowedMeans:
+    def __init__(self, column_names, avg_window, holdback=1000):
+        self.column_names = column_names
+        self.avg_window = avg_window
+        self.holdback = holdback
+
+        self.pending = {col: np.empty(0, dtype=np.int64) for col in column_names}
+        self.pending_iteration = np.empty(0, dtype=np.int64)
+        self.window = {col: np.empty(0, dtype=np.int64) for col in column_names}
+        self.means = {col: [] for col in column_names}
+        self.last_iteration = None
+        self.dropped_rows = 0
+
+    def feed(self, df):
+        if "Iteration" not in df.columns:
+            raise ValueError("file doesn't contain an Iteration column")
+
+        # remove invalid values
+        numeric = {col: pd.to_numeric(df[col], errors='coerce') for col in set(self.column_names) | {"Iteration"}}
+        mask = np.ones(len(df), dtype=bool)
+        for values in numeric.values():
+            mask &= values.notnull().to_numpy()
+
+        rows = {col: values.to_numpy()[mask].astype(np.int64) for col, values in numeric.items()}
+        iteration = rows["Iteration"]
+
+        if self.last_iteration is not None:
+            fresh = iteration > self.last_iteration
+            self.dropped_rows += int(len(iteration) - fresh.sum())
+            rows = {col: array[fresh] for col, array in rows.items()}
+            iteration = rows["Iteration"]
+
+        merged_iteration = np.concatenate([self.pending_iteration, iteration])
+
+        # stable sort with the pending rows first, so the first occurrence of an iteration wins
+        order = np.argsort(merged_iteration, kind='stable')
+        merged_iteration = merged_iteration[order]
+        keep = np.ones(len(merged_iteration), dtype=bool)
+        keep[1:] = merged_iteration[1:] != merged_iteration[:-1]
+
+        merged = {col: np.concatenate([self.pending[col], rows[col]])[order][keep] for col in self.column_names}
+        merged_iteration = merged_iteration[keep]
+
+        num_final = max(0, len(merged_iteration) - self.holdback)
+        self.emit({col: array[:num_final] for col, array in merged.items()}, merged_iteration[:num_final])
+        self.pending = {col: array[num_final:] for col, array in merged.items()}
+        self.pending_iteration = merged_iteration[num_final:]
+
+    def emit(self, rows, iteration):
+        if len(iteration) == 0:
+            return
+        self.last_iteration = int(iteration[-1])
+
+        num_full = (len(self.window[self.column_names[0]]) + len(iteration)) // self.avg_window * self.avg_window
+        for col in self.column_names:
+            values = np.concatenate([self.window[col], rows[col]])
+            if num_full > 0:
+                self.means[col].append(values[:num_full].reshape(-1, self.avg_window).sum(axis=1) / self.avg_window)
+            self.window[col] = values[num_full:]
+
+    # windowed means of everything fed so far, including the pending rows and the last incomplete window
+    def result(self):
+        tail = {col: np.concatenate([self.window[col], self.pending[col]]) for col in self.column_names}
+        tail_means = window_means(tail, self.column_names, self.avg_window)
+
+        return pd.DataFrame({
+            col: np.concatenate(self.means[col] + [tail_means[col].to_numpy()]) for col in self.column_names
+        }, columns=self.column_names)
+
+
+# reads the csv in chunks with only the needed columns while keeping O(chunksize) rows in memory.
+# the last column of the header is read as well to detect partially written lines
+def read_csv_chunked(csv_path, column_names, avg_window, chunksize=100_000, holdback=1000):
+    fs = get_fs(csv_path)
+    with fs.open(csv_path) as f:
+        header = list(pd.read_csv(f, nrows=0).columns)
+    if not all(col in header for col in column_names):
+        raise ValueError(f"file doesn't contain the following columns: {column_names}")
+
+    usecols = list(dict.fromkeys(list(column_names) + ["Iteration", header[-1]]))
+    if not all(col in header for col in usecols):
+        raise ValueError("file doesn't contain an Iteration column")
+
+    accumulator = WindowedMeans(column_names, avg_window, holdback)
+    count("csv_bytes_read", fs.stat(csv_path).st_size)
+    with fs.open(csv_path) as f:
+        for chunk in pd.read_csv(f, usecols=usecols, chunksize=chunksize, on_bad_lines='skip'):
+            chunk = chunk[chunk.notnull().all(axis=1)]
+            accumulator.feed(chunk)
+
+    count("csv_rows_dropped", accumulator.dropped_rows)
+    if accumulator.dropped_rows:
+        print(f"{csv_path}: dropped {accumulator.dropped_rows} duplicate or late rows")
+
+    return accumulator.result()
+
+
+# follows a csv that is still being written. every update() only reads the bytes appended since the last one,
+# up to the last complete line, and folds the new rows into the windowed means. an incomplete trailing line
+# stays in the file until it is finished. a file that got shorter was rewritten and is read again from the start
+class CsvTail:
+    def __init__(self, csv_path, column_names, avg_window, holdback=1000):
+        self.csv_path = csv_path
+        self.column_names = column_names
+        self.avg_window = avg_window
+        self.holdback = holdback
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.header = None
+        self.usecols = None
+        self.accumulator = WindowedMeans(self.column_names, self.avg_window, self.holdback)
+
+    # reads the appended complete lines and returns how many rows were added
+    def update(self):
+        fs = get_fs(self.csv_path)
+        size = fs.stat(self.csv_path).st_size
+        if size < self.offset:
+            self.reset()
+        if size == self.offset:
+            return 0
+
+        with fs.open(self.csv_path) as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return 0
+        data = data[:end]
+        self.offset += end
+
+        if self.header is None:
+            header_end = data.index(b"\n") + 1
+            self.header = list(pd.read_csv(io.BytesIO(data[:header_end]), nrows=0).columns)
+            if not all(col in self.header for col in list(self.column_names) + ["Iteration"]):
+                raise ValueError(f"file doesn't contain the following columns: {self.column_names}")
+            # the last column is read as well to detect rows with missing fields
+            self.usecols = list(dict.fromkeys(list(self.column_names) + ["Iteration", self.header[-1]]))
+            data = data[header_end:]
+            if not data:
+                return 0
+
+        chunk = pd.read_csv(io.BytesIO(data), header=None, names=self.header, usecols=self.usecols,
+                            on_bad_lines='skip')
+        chunk = chunk[chunk.notnull().all(axis=1)]
+        self.accumulator.feed(chunk)
+        return len(chunk)
+
+    def result(self):
+        return self.accumulator.result()
@@ -0,0 +1,70 @@
+import numpy as np
+
+# two points (min and max) per horizontal pixel keep every spike visible
+POINTS_PER_PIXEL = 2
+
+
+# min/max preserving decimation of a series sorted by x: the visible range [x_min, x_max] is split into
+# num_bins equally wide bins and only the smallest and the largest point of every bin are kept
+def minmax_decimate(x, y, x_min, x_max, num_bins):
+    # one point beyond each side of the view, so the line does not end at the border of the axes
+    start = max(0, np.searchsorted(x, x_min, side='left') - 1)
+    end = min(len(x), np.searchsorted(x, x_max, side='right') + 1)
+    x, y = x[start:end], y[start:end]
+
+    if len(x) <= 2 * num_bins or x[-1] == x[0]:
+        return x, y
+
+    bins = ((x - x[0]) * (num_bins / (x[-1] - x[0]))).astype(np.int64)
+    np.minimum(bins, num_bins - 1, out=bins)
+
+    bin_starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    bin_of_point = np.cumsum(np.r_[True, bins[1:] != bins[:-1]]) - 1
+
+    # the first point of a bin reaching the bin's min / max
+    bin_min = np.minimum.reduceat(y, bin_starts)
+    bin_max = np.maximum.reduceat(y, bin_starts)
+    is_min = np.flatnonzero(y == bin_min[bin_of_point])
+    is_max = np.flatnonzero(y == bin_max[bin_of_point])
+    first_min = is_min[np.r_[True, bin_of_point[is_min][1:] != bin_of_point[is_min][:-1]]]
+    first_max = is_max[np.r_[True, bin_of_point[is_max][1:] != bin_of_point[is_max][:-1]]]
+
+    keep = np.unique(np.concatenate([[0], first_min, first_max, [len(x) - 1]]))
+    return x[keep], y[keep]
+
+
+# a Line2D that only holds a decimated copy of the full resolution data, recomputed whenever
+# the x-limits (zoom / pan of the toolbar) or the size of the axes change
+class DecimatedLine:
+    def __init__(self, ax, line, x, y, points_per_pixel=POINTS_PER_PIXEL):
+        self.ax = ax
+        self.line = line
+        self.points_per_pixel = points_per_pixel
+        self.set_full_data(x, y)
+
+        self.callbacks = [ax.callbacks.connect('xlim_changed', self.update)]
+        self.resize_id = ax.figure.canvas.mpl_connect('resize_event', self.update)
+
+    def set_full_data(self, x, y):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.update()
+
+    def update(self, *args):
+        if len(self.x) == 0:
+            self.line.set_data(self.x, self.y)
+            return
+
+        # an autoscaling axis adapts to the data, so the whole series is in view
+        if self.ax.get_autoscalex_on():
+            x_min, x_max = self.x[0], self.x[-1]
+        else:
+            x_min, x_max = sorted(self.ax.get_xlim())
+
+        num_bins = max(1, int(self.ax.bbox.width * self.points_per_pixel / 2))
+        self.line.set_data(*minmax_decimate(self.x, self.y, x_min, x_max, num_bins))
+
+    def disconnect(self):
+        for callback in self.callbacks:
+            self.ax.callbacks.disconnect(callback)
+        self.ax.figure.canvas.mpl_disconnect(self.resize_id)
@@ -1,8 +1,13 @@
 import os
 from enum import Enum
 import numpy as np
+import matplotlib
+from graph_utils import PlotInfo, find_yaml, sort_criteria, read_slurm, map_folders_to_colors, use_backend
+use_backend()
 import matplotlib.pyplot as plt
-from graph_utils import PlotInfo, find_yaml, sort_criteria, read_slurm, map_folders_to_colors
+from experiment_fs import get_fs
+from distribution_stats import point_statistics, bxp_stats, violin_stats
+from profiling import span, trace_draws
 
 class PlotType(Enum):
     BOX_PLOT = 1
@@ -10,15 +15,7 @@ class PlotType(Enum):
 
 
 def sort_data(data):
-    for folder in data.values():
-        combined = list(zip(folder['value'], folder['time']))
-
-        combined.sort(key=lambda x: x[0])
-        folder['value'], folder['time'] = zip(*combined)
-
-    for folder in data.values():
-        folder['value'] = list(folder['value'])
-        folder['time'] = [list(times) for times in folder['time']]
+    return data.sorted()
 
 def format_folder_name(folder_name):
     if "fastParticleBuffer" in folder_name:
@@ -37,14 +34,21 @@ def darken_color(color, factor=0.6):
     darker_rgb = np.clip(rgb * factor, 0, 1)
     return tuple(darker_rgb) + (color[3],)
 
-def plot_grouped_boxplots(ax, x, y, width, folder, color):
-    bp = ax.boxplot(
-        y,
+# stats: the precomputed boxplot_stats of the boxes, drawn with the settings ax.boxplot would use
+def plot_grouped_boxplots(ax, x, stats, width, folder, color):
+    bp = ax.bxp(
+        stats,
         positions=x,
         widths=width,
         patch_artist=True,
         manage_ticks=False,
         showmeans=True,
+        shownotches=matplotlib.rcParams['boxplot.notch'],
+        showcaps=matplotlib.rcParams['boxplot.showcaps'],
+        showbox=matplotlib.rcParams['boxplot.showbox'],
+        showfliers=matplotlib.rcParams['boxplot.showfliers'],
+        meanline=matplotlib.rcParams['boxplot.meanline'],
+        boxprops={'linestyle': 'solid'},
         meanprops={
             "marker": "o",
             "markerfacecolor": "red",
@@ -62,9 +66,10 @@ def plot_grouped_boxplots(ax, x, y, width, folder, color):
 
     ax.scatter([], [], color=color, label=format_folder_name(folder))
 
-def plot_grouped_violinplots(ax, x, y, width, folder, color):
-    parts = ax.violinplot(
-        y,
+# stats: the precomputed violin_stats (KDE on a grid) of the violins
+def plot_grouped_violinplots(ax, x, stats, width, folder, color):
+    parts = ax.violin(
+        stats,
         positions=x,
         showmeans=True,
         showextrema=True,
@@ -85,15 +90,21 @@ def plot_grouped_violinplots(ax, x, y, width, folder, color):
 
     ax.scatter([], [], color=color, label=format_folder_name(folder))
 
-def plot(data, folders, title, plot_type=PlotType.BOX_PLOT):
-    sort_data(data)
+# ax: draw into an existing axes (e.g. redrawn by watch mode) instead of a new figure
+def plot(data, folders, title, plot_type=PlotType.BOX_PLOT, show=True, ax=None, x_label="Frequency",
+         y_label="Time (s)"):
+    data = sort_data(data)
     folders = sorted(folders, key=sort_criteria)
     folder_colors = map_folders_to_colors(folders)
 
     fig_width = 15  # Width of the figure in inches
-    fig, ax = plt.subplots(figsize=(fig_width, 9))
+    if ax is None:
+        fig, ax = plt.subplots(figsize=(fig_width, 9))
+    else:
+        ax.cla()
+        fig = ax.figure
 
-    original_positions = list(data[list(data.keys())[0]]["value"])
+    original_positions = list(data.values(data.folders[0]))
     num_positions = len(original_positions)
     num_folders = len(folders)
 
@@ -104,20 +115,24 @@ def plot(data, folders, title, plot_type=PlotType.BOX_PLOT):
 
     ticks = [pos * group_spacing for pos in range(num_positions)]
 
-    for i, folder in enumerate(folders):
-        adjusted_positions = [
-            tick - (num_folders - 1) * offset / 2 + i * offset for tick in ticks
-        ]
+    if plot_type not in (PlotType.BOX_PLOT, PlotType.VIOLIN_PLOT):
+        raise ValueError(f'No such plot type as "{plot_type}"')
+    stats = point_statistics("box" if plot_type == PlotType.BOX_PLOT else "violin", data)
 
-        y = data[folder]["time"]
-        color = folder_colors[folder]
+    with span("distribution.build", plot_type=plot_type.name):
+        for i, folder in enumerate(folders):
+            adjusted_positions = [
+                tick - (num_folders - 1) * offset / 2 + i * offset for tick in ticks
+            ]
 
-        if plot_type == PlotType.BOX_PLOT:
-            plot_grouped_boxplots(ax, adjusted_positions, y, width, folder, color)
-        elif plot_type == PlotType.VIOLIN_PLOT:
-            plot_grouped_violinplots(ax, adjusted_positions, y, width, folder, color)
-        else:
-            raise ValueError(f'No such plot type as "{plot_type}"')
+            start, end = data.point_range(folder)
+            color = folder_colors[folder]
+
+            if plot_type == PlotType.BOX_PLOT:
+                plot_grouped_boxplots(ax, adjusted_positions, bxp_stats(stats, start, end), width, folder, color)
+            else:
+                vpstats, positions = violin_stats(stats, start, end, adjusted_positions)
+                plot_grouped_violinplots(ax, positions, vpstats, width, folder, color)
 
 
     for x in ticks[:-1]:
@@ -127,29 +142,53 @@ def plot(data, folders, title, plot_type=PlotType.BOX_PLOT):
     ax.set_xticklabels(original_positions, fontsize=12, rotation=45)
 
     ax.set_title(title, fontsize=16)
-    ax.set_xlabel("Frequency", fontsize=14)
-    ax.set_ylabel("Time (s)", fontsize=14)
+    ax.set_xlabel(x_label, fontsize=14)
+    ax.set_ylabel(y_label, fontsize=14)
     ax.legend(title="Buffer Thresholds", fontsize=12)
     ax.grid(axis="y", linestyle="--", alpha=0.7)
 
-    plt.tight_layout()
-    plt.show()
+    fig.tight_layout()
+    trace_draws(fig, "distribution.draw")
+    if show:
+        plt.show()
+    return fig
 
-def plot_distribution_graph(base_path, plot_type: PlotType, folders=[]):
+# x_key / y_key group and plot other fields of the logs (see graph_utils.parse_slurm_fields),
+# workers / executor set the pool the logs are parsed on (see graph_utils.parse_slurm_files)
+def plot_distribution_graph(base_path, plot_type: PlotType, folders=[], catalog=None, show=True, x_key=None,
+                            y_key=None, workers=None, executor="thread"):
     if not "Percentage" in base_path:
         print("This plot can only be used with percentage experiments. Try another plot!")
         return
 
     if len(folders) == 0:
-        folders = [name for name in os.listdir(base_path) if os.path.isdir(os.path.join(base_path, name))]
-
-    yaml_file_name, yaml_file_path = find_yaml(base_path)
-
-    title = "Frequency" if "frequency" in base_path else "Iteration"
-    title = title + f" in {yaml_file_name}"
-
-    data = read_slurm( folders, base_path, True, True)
-    plot(data, folders, title, plot_type)
+        if catalog is not None:
+            folders = catalog.folders(base_path)
+        else:
+            fs = get_fs(base_path)
+            folders = [name for name in fs.listdir(base_path) if fs.isdir(os.path.join(base_path, name))]
+
+    if catalog is not None:
+        yaml_file_name, yaml_file_path = catalog.find_yaml(base_path)
+    else:
+        yaml_file_name, yaml_file_path = find_yaml(base_path)
+
+    x_name = "Frequency" if "frequency" in base_path else "Iteration"
+    title = x_name + f" in {yaml_file_name}"
+    if x_key is not None or y_key is not None:
+        title = f"{x_key or x_name} vs {y_key or 'Time'} in {yaml_file_name}"
+
+    try:
+        with span("distribution.read", base_path=base_path):
+            if catalog is not None:
+                data = catalog.read_slurm(folders, base_path, True, True, x_key, y_key, workers, executor)
+            else:
+                data = read_slurm( folders, base_path, True, True, workers=workers, executor=executor, x_key=x_key,
+                                  y_key=y_key)
+    except ValueError as e:
+        print(e)
+        return None
+    return plot(data, folders, title, plot_type, show, x_label=x_key or "Frequency", y_label=y_key or "Time (s)")
 
 
 if __name__ == "__main__":
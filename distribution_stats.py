@@ -0,0 +1,183 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from profiling import span, count
+
+# box and violin statistics of all sweep points of a RunTable at once, in the format of
+# matplotlib.cbook.boxplot_stats / violin_stats, so the plots only draw them with ax.bxp / ax.violin.
+# the results are kept in memory, keyed by a digest of the run times
+WHIS = 1.5  # whiskers at 1.5 IQR, like ax.boxplot
+VIOLIN_POINTS = 100  # KDE grid points of a violin, like ax.violinplot
+MEMO_SIZE = 16
+
+memo = OrderedDict()
+memo_lock = threading.Lock()
+
+
+# the runs of every point sorted by time, and the point of every run
+def sort_runs(offsets, times):
+    counts = np.diff(offsets)
+    run_point = np.repeat(np.arange(len(counts)), counts)
+    order = np.lexsort((times, run_point))
+    return counts, run_point, times[order]
+
+
+# np.percentile with the default linear interpolation, for every point at once (NaN for points without runs)
+def percentiles(offsets, counts, x, q):
+    position = q / 100 * np.maximum(counts - 1, 0)
+    below = np.floor(position).astype(np.int64)
+    above = np.minimum(below + 1, np.maximum(counts - 1, 0))
+    t = position - below
+
+    valid = counts > 0
+    a = np.full(len(counts), np.nan)
+    b = np.full(len(counts), np.nan)
+    a[valid] = x[offsets[:-1][valid] + below[valid]]
+    b[valid] = x[offsets[:-1][valid] + above[valid]]
+    # the same two sided lerp numpy uses
+    diff = b - a
+    return np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+
+
+def point_means(run_point, counts, x):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.bincount(run_point, weights=x, minlength=len(counts)) / counts
+
+
+# quartiles, whiskers, notches, means and fliers of every point, see matplotlib.cbook.boxplot_stats
+def box_statistics(offsets, times, whis=WHIS):
+    counts, run_point, x = sort_runs(offsets, times)
+    q1 = percentiles(offsets, counts, x, 25)
+    med = percentiles(offsets, counts, x, 50)
+    q3 = percentiles(offsets, counts, x, 75)
+    iqr = q3 - q1
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        notch = 1.57 * iqr / np.sqrt(counts)
+
+    # the runs are sorted inside a point, so the runs up to hival are a prefix and the runs from loval a suffix
+    with np.errstate(invalid='ignore'):
+        below_hi = np.bincount(run_point, weights=x <= (q3 + whis * iqr)[run_point], minlength=len(counts))
+        below_lo = np.bincount(run_point, weights=x < (q1 - whis * iqr)[run_point], minlength=len(counts))
+    below_hi = below_hi.astype(np.int64)
+    below_lo = below_lo.astype(np.int64)
+
+    starts = offsets[:-1]
+    whishi = q3.copy()
+    has_hi = below_hi > 0
+    highest = x[starts[has_hi] + below_hi[has_hi] - 1]
+    whishi[has_hi] = np.where(highest < q3[has_hi], q3[has_hi], highest)
+
+    whislo = q1.copy()
+    has_lo = below_lo < counts
+    lowest = x[starts[has_lo] + below_lo[has_lo]]
+    whislo[has_lo] = np.where(lowest > q1[has_lo], q1[has_lo], lowest)
+
+    is_flier = (x < whislo[run_point]) | (x > whishi[run_point])
+    flier_offsets = np.concatenate([[0], np.cumsum(np.bincount(run_point[is_flier], minlength=len(counts)))])
+
+    return {
+        "mean": point_means(run_point, counts, x), "med": med, "q1": q1, "q3": q3, "iqr": iqr,
+        "cilo": med - notch, "cihi": med + notch, "whislo": whislo, "whishi": whishi,
+        "flier_offsets": flier_offsets.astype(np.int64), "fliers": x[is_flier],
+    }
+
+
+# gaussian KDE (scott's bandwidth, like matplotlib.mlab.GaussianKDE) of every point on a grid of `points`
+# coordinates between its smallest and largest run. the runs are linearly binned onto the grid and convolved
+# with the kernel of their point in one batch of FFTs, instead of evaluating every kernel at every coordinate
+def violin_statistics(offsets, times, points=VIOLIN_POINTS):
+    counts, run_point, x = sort_runs(offsets, times)
+    starts = offsets[:-1]
+    valid = counts > 0
+
+    low = np.zeros(len(counts))
+    high = np.zeros(len(counts))
+    low[valid] = x[starts[valid]]
+    high[valid] = x[offsets[1:][valid] - 1]
+    coords = np.linspace(low, high, points, axis=1)
+
+    means = point_means(run_point, counts, x)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = np.bincount(run_point, weights=(x - means[run_point]) ** 2, minlength=len(counts)) / (counts - 1)
+        bandwidth = np.sqrt(variance) * np.power(counts.astype(np.float64), -1 / 5)
+
+    # a single value (or all runs equal) gets matplotlib's fallback: 1 where the coordinate is that value
+    spread = valid & (high > low) & (bandwidth > 0)
+    step = np.where(spread, (high - low) / (points - 1), 1.0)
+
+    position = np.where(spread[run_point], (x - low[run_point]) / step[run_point], 0.0)
+    left = np.minimum(np.floor(position).astype(np.int64), points - 2)
+    fraction = position - left
+    cell = run_point * points + left
+    grid = np.bincount(cell, weights=1 - fraction, minlength=len(counts) * points)
+    grid += np.bincount(cell + 1, weights=fraction, minlength=len(counts) * points)
+    grid = grid.reshape(len(counts), points)
+
+    # kernel offsets 0..points-1 and -points..-1, long enough that the circular convolution does not wrap around
+    size = 2 * points
+    lags = np.fft.fftfreq(size, 1 / size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        kernel = np.exp(-0.5 * (lags[None, :] * (step / bandwidth)[:, None]) ** 2)
+        kernel /= (counts * bandwidth * np.sqrt(2 * np.pi))[:, None]
+    kernel[~spread] = 0
+
+    vals = np.fft.irfft(np.fft.rfft(grid, size) * np.fft.rfft(kernel, size), size)[:, :points]
+    vals = np.maximum(vals, 0)
+    vals[~spread] = (coords[~spread] == low[~spread, None]).astype(np.float64)
+
+    return {
+        "coords": coords, "vals": vals, "mean": means,
+        "median": percentiles(offsets, counts, x, 50), "min": low, "max": high, "count": counts,
+    }
+
+
+STATISTICS = {"box": box_statistics, "violin": violin_statistics}
+
+
+def stats_digest(kind, table):
+    digest = hashlib.sha1(f"{kind}:{WHIS}:{VIOLIN_POINTS}".encode())
+    digest.update(np.ascontiguousarray(table.offsets).tobytes())
+    digest.update(np.ascontiguousarray(table.times).tobytes())
+    return digest.hexdigest()
+
+
+# the statistics of every point of the table (kind "box" or "violin"). repeated renders of the same runs
+# in one process (watch mode, the same plot drawn again) take them from memory
+def point_statistics(kind, table):
+    digest = stats_digest(kind, table)
+    with memo_lock:
+        if digest in memo:
+            memo.move_to_end(digest)
+            count("distribution_stats_hits", 1)
+            return memo[digest]
+
+    with span("distribution.statistics", kind=kind, points=len(table), runs=len(table.times)):
+        stats = STATISTICS[kind](table.offsets, table.times)
+
+    with memo_lock:
+        memo[digest] = stats
+        while len(memo) > MEMO_SIZE:
+            memo.popitem(last=False)
+    return stats
+
+
+# the matplotlib.cbook.boxplot_stats dicts of the points start..end, for ax.bxp
+def bxp_stats(stats, start, end):
+    keys = ["mean", "med", "q1", "q3", "iqr", "cilo", "cihi", "whislo", "whishi"]
+    flier_offsets = stats["flier_offsets"]
+    return [dict({key: stats[key][i] for key in keys},
+                 fliers=stats["fliers"][flier_offsets[i]:flier_offsets[i + 1]]) for i in range(start, end)]
+
+
+# the matplotlib.cbook.violin_stats dicts of the points start..end for ax.violin, with the positions they go to.
+# points without runs are left out, ax.violin cannot draw them
+def violin_stats(stats, start, end, positions):
+    keys = ["coords", "vals", "mean", "median", "min", "max"]
+    vpstats, kept = [], []
+    for i, position in zip(range(start, end), positions):
+        if stats["count"][i] > 0:
+            vpstats.append(dict({key: stats[key][i] for key in keys}, quantiles=np.empty(0)))
+            kept.append(position)
+    return vpstats, kept
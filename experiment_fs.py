@@ -0,0 +1,134 @@
+import io
+import os
+import time
+import zipfile
+import threading
+
+# paths below an archive are written as if the archive was a folder, e.g.
+# /data/Experiments.zip/NormalExperiments/fallingDrop/vlc_c08/frequency_tests
+ARCHIVE_SUFFIX = ".zip"
+# caches and sidecars of archived experiments are written next to the archive, inside <archive>.cache
+ARCHIVE_CACHE_SUFFIX = ".cache"
+
+
+class LocalFS:
+    def listdir(self, path):
+        return os.listdir(path)
+
+    def isdir(self, path):
+        return os.path.isdir(path)
+
+    def isfile(self, path):
+        return os.path.isfile(path)
+
+    def stat(self, path):
+        return os.stat(path)
+
+    def getmtime(self, path):
+        return os.path.getmtime(path)
+
+    def open(self, path, mode="rb"):
+        return open(path, mode)
+
+    # folder where caches belonging to path are stored
+    def cache_dir(self, path):
+        return path
+
+
+class ZipStat:
+    def __init__(self, info):
+        self.st_size = info.file_size
+        self.st_mtime = time.mktime(info.date_time + (0, 0, -1))
+        self.st_mtime_ns = int(self.st_mtime) * 1_000_000_000
+
+
+# read-only view of a zip archive. the central directory is the listing index,
+# members are only decompressed (as a stream) when they are opened
+class ZipFS:
+    def __init__(self, archive_path):
+        self.archive_path = os.path.abspath(archive_path)
+        self.archive = zipfile.ZipFile(self.archive_path)
+        self.files = {}
+        self.children = {"": set()}
+
+        for info in self.archive.infolist():
+            name = info.filename.rstrip("/")
+            if not name:
+                continue
+            if not info.is_dir():
+                self.files[name] = info
+
+            parts = name.split("/")
+            for i in range(len(parts)):
+                parent = "/".join(parts[:i])
+                self.children.setdefault(parent, set()).add(parts[i])
+            if info.is_dir():
+                self.children.setdefault(name, set())
+
+    def inner(self, path):
+        path = os.path.abspath(path)
+        if path == self.archive_path:
+            return ""
+        if not path.startswith(self.archive_path + os.sep):
+            raise FileNotFoundError(f"{path} is not inside {self.archive_path}")
+        return path[len(self.archive_path) + 1:].replace(os.sep, "/")
+
+    def listdir(self, path):
+        inner = self.inner(path)
+        if inner not in self.children:
+            raise FileNotFoundError(f"No such folder in archive: {path}")
+        return sorted(self.children[inner])
+
+    def isdir(self, path):
+        return self.inner(path) in self.children
+
+    def isfile(self, path):
+        return self.inner(path) in self.files
+
+    def info(self, path):
+        inner = self.inner(path)
+        if inner not in self.files:
+            raise FileNotFoundError(f"No such file in archive: {path}")
+        return self.files[inner]
+
+    def stat(self, path):
+        return ZipStat(self.info(path))
+
+    def getmtime(self, path):
+        return self.stat(path).st_mtime
+
+    def open(self, path, mode="rb"):
+        stream = self.archive.open(self.info(path))
+        if "b" in mode:
+            return stream
+        return io.TextIOWrapper(stream)
+
+    def cache_dir(self, path):
+        return os.path.join(self.archive_path + ARCHIVE_CACHE_SUFFIX, self.inner(path))
+
+
+LOCAL_FS = LocalFS()
+archives = {}
+archives_lock = threading.Lock()
+
+
+def open_archive(archive_path):
+    with archives_lock:
+        if archive_path not in archives:
+            archives[archive_path] = ZipFS(archive_path)
+        return archives[archive_path]
+
+
+# the file system a path lives on: the local one or the zip archive that is part of the path
+def get_fs(path):
+    if ARCHIVE_SUFFIX not in path.lower():
+        return LOCAL_FS
+
+    head = os.path.abspath(path)
+    while True:
+        if head.lower().endswith(ARCHIVE_SUFFIX) and os.path.isfile(head):
+            return open_archive(head)
+        parent = os.path.dirname(head)
+        if parent == head:
+            return LOCAL_FS
+        head = parent
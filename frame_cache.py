@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+
+
+def frame_size(frame):
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+
+# least recently used cache of processed data frames with a memory budget in bytes.
+# prefetch() loads frames on a background worker, a get_or_load() for a frame that is still
+# being prefetched waits for that load instead of starting a second one
+class FrameCache:
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES, workers=1):
+        self.max_bytes = max_bytes
+        self.frames = OrderedDict()
+        self.sizes = {}
+        self.total_bytes = 0
+        self.loading = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.frames:
+                return None
+            self.frames.move_to_end(key)
+            return self.frames[key]
+
+    def put(self, key, frame):
+        size = frame_size(frame)
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.frames:
+                self.total_bytes -= self.sizes[key]
+            self.frames[key] = frame
+            self.frames.move_to_end(key)
+            self.sizes[key] = size
+            self.total_bytes += size
+
+            while self.total_bytes > self.max_bytes:
+                old_key, _ = self.frames.popitem(last=False)
+                self.total_bytes -= self.sizes.pop(old_key)
+
+    def get_or_load(self, key, loader):
+        frame = self.get(key)
+        if frame is not None:
+            return frame
+
+        with self.lock:
+            future = self.loading.get(key)
+        if future is not None:
+            try:
+                frame = future.result()
+            except CancelledError:
+                frame = None
+            if frame is not None:
+                return frame
+
+        frame = loader()
+        self.put(key, frame)
+        return frame
+
+    def prefetch(self, key, loader):
+        with self.lock:
+            if key in self.frames or key in self.loading:
+                return
+            self.loading[key] = self.executor.submit(self.load, key, loader)
+
+    # drops the prefetches that have not started yet, the running ones still finish
+    def cancel_prefetches(self):
+        with self.lock:
+            for key, future in list(self.loading.items()):
+                if future.cancel():
+                    del self.loading[key]
+
+    def load(self, key, loader):
+        try:
+            frame = loader()
+            self.put(key, frame)
+            return frame
+        except Exception as e:
+            print(f"Prefetching {key} failed: {e}")
+            return None
+        finally:
+            with self.lock:
+                self.loading.pop(key, None)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,12 +1,22 @@
-import matplotlib
-matplotlib.use('TkAgg')
-import matplotlib.pyplot as plt
 import os
 import re
+import json
 import math
-import pandas as pd
+import mmap
+import threading
+from itertools import repeat
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import numpy as np
-from matplotlib import cm, colors
+from experiment_fs import get_fs, LOCAL_FS
+from run_table import RunTable
+from profiling import span, count
+
+# headless runs (batch rendering) select another backend through GRAPHVIEW_BACKEND.
+# every plot module calls this before it imports pyplot
+def use_backend():
+    import matplotlib
+    matplotlib.use(os.environ.get("GRAPHVIEW_BACKEND", "TkAgg"))
+
 
 class PlotInfo:
     def __init__(self, x_label, y_label, title ):
@@ -37,7 +47,7 @@ def sort_criteria(folder):
 # supposing the yaml is one level up from path (which is the case most of the time)
 def find_yaml(path):
     parent = os.path.dirname(path)
-    yaml_files = [f for f in os.listdir(parent) if f.endswith(".yaml")]
+    yaml_files = [f for f in get_fs(parent).listdir(parent) if f.endswith(".yaml")]
     if len(yaml_files) == 0:
         raise Exception(f"No Yaml File was Found in {path}")
     elif len(yaml_files) > 1:
@@ -50,7 +60,7 @@ def find_yaml(path):
 
 
 def print_yaml_file(yamlFileNamePath):
-    with open(yamlFileNamePath, "r") as yamlFile:
+    with get_fs(yamlFileNamePath).open(yamlFileNamePath, "r") as yamlFile:
         contents = yamlFile.read()
         print(contents)
 
@@ -89,8 +99,13 @@ def get_frequencies():
         freq += step_size
     return frequencies
 
+# matplotlib (and pandas below) are only imported when needed, so the command line and the statistics
+# do not pay for them and the plot modules choose the backend
 def map_folders_to_colors(folders):
-    blue_cmap_full = cm.get_cmap('Blues')
+    import matplotlib
+    from matplotlib import colors
+
+    blue_cmap_full = matplotlib.colormaps['Blues']
     blue_cmap = colors.LinearSegmentedColormap.from_list(
         'truncated_Blues', blue_cmap_full(np.linspace(0.3, 1.0, 256))
     )
@@ -106,8 +121,64 @@ def map_folders_to_colors(folders):
     return folder_colors
 
 
+# nearest plotted point to a mouse position, in display (pixel) space so differently scaled axes do not matter.
+# the points are bucketed into a grid with cells as large as the search radius, so a lookup only has to
+# look at the 3x3 cells around the cursor. the grid is rebuilt lazily whenever the view (zoom, pan, resize) changed
+class PointIndex:
+    def __init__(self, ax, x, y, labels, radius=10):
+        self.ax = ax
+        self.radius = radius
+        self.data = np.empty((0, 2))
+        self.labels = np.empty(0, dtype=object)
+        self.view = None
+        self.extend(x, y, labels)
+
+    def extend(self, x, y, labels):
+        points = np.column_stack([np.asarray(x, dtype=float), np.asarray(y, dtype=float)])
+        self.data = np.concatenate([self.data, points.reshape(-1, 2)])
+        self.labels = np.concatenate([self.labels, np.asarray(labels, dtype=object)])
+        self.view = None
+
+    def current_view(self):
+        return tuple(self.ax.viewLim.bounds) + tuple(self.ax.bbox.bounds)
+
+    def rebuild(self):
+        self.pixels = self.ax.transData.transform(self.data) if len(self.data) else np.empty((0, 2))
+        cells = np.floor(self.pixels / self.radius).astype(np.int64)
+        keys = self.cell_keys(cells[:, 0], cells[:, 1])
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+        self.view = self.current_view()
+
+    @staticmethod
+    def cell_keys(cx, cy):
+        return cx * 1_000_003 + cy
+
+    # index of the nearest point within radius pixels of (px, py), or None
+    def nearest(self, px, py):
+        if self.view != self.current_view():
+            self.rebuild()
+
+        cx, cy = int(np.floor(px / self.radius)), int(np.floor(py / self.radius))
+        neighbour_keys = self.cell_keys(np.repeat(np.arange(cx - 1, cx + 2), 3), np.tile(np.arange(cy - 1, cy + 2), 3))
+        starts = np.searchsorted(self.keys, neighbour_keys, side='left')
+        ends = np.searchsorted(self.keys, neighbour_keys, side='right')
+
+        candidates = np.concatenate([self.order[start:end] for start, end in zip(starts, ends)])
+        if len(candidates) == 0:
+            return None
+
+        distances = ((self.pixels[candidates] - (px, py)) ** 2).sum(axis=1)
+        best = np.argmin(distances)
+        if distances[best] > self.radius ** 2:
+            return None
+        return int(candidates[best])
+
+
 def generate_distinct_colors(x):
-    cmap = plt.get_cmap("tab10") if x <= 10 else plt.get_cmap("tab20")
+    import matplotlib
+
+    cmap = matplotlib.colormaps["tab10"] if x <= 10 else matplotlib.colormaps["tab20"]
     excluded_colors = {cmap(1), cmap(2)}  # tab10: 1 (orange), 2 (blue)
 
     cols = []
@@ -120,83 +191,431 @@ def generate_distinct_colors(x):
 
     return cols
 
-def read_slurm(folders, base_path, is_percentage, is_distribution_plot):
-    data = {folder: {"value": [], "time": []} for folder in folders}
+SLURM_CACHE_FILE = ".slurm_cache.json"
+SLURM_CACHE_VERSION = 1
 
-    time_pattern = re.compile(r"Total wall-clock time\s+:\s+(\d+)\s+ns")
+slurm_file_pattern = re.compile(r"[a-zA-Z0-9_-]+_(\d+)\.(\d+)")
 
-    if "frequency" in base_path:
-        pattern = re.compile(r"verlet-rebuild-frequency\s+:\s+(\d+)")
+
+# parsed .out results per base_path, stored as json next to the experiment folders.
+# finished slurm logs never change, so an entry stays valid as long as size and mtime match
+class SlurmCache:
+    def __init__(self, base_path):
+        self.path = os.path.join(get_fs(base_path).cache_dir(base_path), SLURM_CACHE_FILE)
+        self.base_path = base_path
+        self.entries = {}
+        self.dirty = False
+
+        try:
+            with open(self.path, "r") as f:
+                cache = json.load(f)
+            if cache.get("version") == SLURM_CACHE_VERSION:
+                self.entries = cache["files"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def key(self, file_path):
+        return os.path.relpath(file_path, self.base_path)
+
+    # an entry holds the value and time ("time_ns") and / or all fields of the log ("fields"),
+    # depending on what was parsed. result is the one that is needed
+    def lookup(self, file_path, stat, result="time_ns"):
+        entry = self.entries.get(self.key(file_path))
+        if entry is None or entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime_ns:
+            return None
+        if result is not None and result not in entry:
+            return None
+        return entry
+
+    def store(self, file_path, stat, **results):
+        entry = self.lookup(file_path, stat, None)
+        if entry is None:
+            match = slurm_file_pattern.search(os.path.basename(file_path))
+            entry = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "slurm_id": int(match.group(2)) if match else None,
+            }
+            self.entries[self.key(file_path)] = entry
+        entry.update(results)
+        self.dirty = True
+        return entry
+
+    def save(self):
+        if not self.dirty:
+            return
+
+        # every writer has its own temporary file, batch workers and watch mode may save the same cache at once.
+        # the last one replacing the cache wins, the entries it is missing are parsed again next time
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump({"version": SLURM_CACHE_VERSION, "files": self.entries}, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError as e:
+            print(f"Could not write slurm cache {self.path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+# the rebuild frequency / iterations are printed in the header of the log and the wall-clock time in its footer,
+# so only a bounded window at both ends is scanned. the whole file is only searched if a field is missing there
+SLURM_HEAD_WINDOW = 64 * 1024
+SLURM_TAIL_WINDOW = 64 * 1024
+
+
+def search_slurm_windows(head, tail, size, read_all, pattern, time_pattern):
+    value_match = pattern.search(head)
+    # a match touching the end of the head window could be cut off (e.g. "160" read as "16")
+    if value_match and value_match.end() == len(head) and len(head) < size:
+        value_match = None
+    time_match = time_pattern.search(tail)
+
+    if value_match is None or time_match is None:
+        content = read_all()
+        value_match = value_match or pattern.search(content)
+        time_match = time_match or time_pattern.search(content)
+        count("slurm_bytes_read", size)
+    else:
+        count("slurm_bytes_read", min(size, len(head) + len(tail)))
+
+    if value_match and time_match:
+        return int(value_match.group(1)), int(time_match.group(1))
+    return None, None
+
+
+# opens a log and calls search(head, tail, size, read_all) with the first and last bytes of it
+def search_slurm_file(file_path, search):
+    fs = get_fs(file_path)
+    if fs is not LOCAL_FS:
+        return search_archived_slurm_file(fs, file_path, search)
+
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return search(b"", b"", 0, lambda: b"")
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            head = content[:SLURM_HEAD_WINDOW]
+            tail = content[max(0, size - SLURM_TAIL_WINDOW):]
+            return search(head, tail, size, lambda: content)
+
+
+# archive members can not be mapped, the windows are read from the decompressed stream instead
+def search_archived_slurm_file(fs, file_path, search):
+    size = fs.stat(file_path).st_size
+    if size == 0:
+        return search(b"", b"", 0, lambda: b"")
+
+    with fs.open(file_path) as f:
+        head = f.read(SLURM_HEAD_WINDOW)
+        tail_start = max(0, size - SLURM_TAIL_WINDOW)
+        if tail_start <= len(head):
+            tail = head[tail_start:] + f.read()
+        else:
+            f.seek(tail_start)
+            tail = f.read()
+
+        def read_all():
+            f.seek(0)
+            return f.read()
+
+        return search(head, tail, size, read_all)
+
+
+def parse_slurm_file(file_path, pattern, time_pattern):
+    with span("parse_slurm_file", file=file_path):
+        return search_slurm_file(file_path, lambda head, tail, size, read_all:
+                                 search_slurm_windows(head, tail, size, read_all, pattern, time_pattern))
+
+
+# "key : value" lines of an AutoPas log, e.g. the configuration at its start and the timers at its end.
+# every word of a key starts with a letter or bracket, so progress lines like "Iteration 10 : ..." are skipped.
+# leading "[...]" log tags are ignored. the pattern of the following lines starts with the newline,
+# which lets the regex engine jump from line to line instead of trying every position
+SLURM_FIELD_LINE = (rb"[ \t]*(?:\[[^\]\n]*\][ \t]*)*"
+                    rb"([A-Za-z][\w\-()\[\]/.,]*(?:[ \t]+[A-Za-z(\[][\w\-()\[\]/.,]*)*+)[ \t]*:[ \t]*([^\r\n]*)")
+slurm_first_field_pattern = re.compile(SLURM_FIELD_LINE)
+slurm_field_pattern = re.compile(rb"\n" + SLURM_FIELD_LINE)
+slurm_number_pattern = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+slurm_unit_pattern = re.compile(r"[ \t]*([A-Za-z%]+)?(?=$|[\s(])")
+# units of the timers per second
+TIME_UNITS = {"ns": 1e9, "us": 1e6, "ms": 1e3, "s": 1.0}
+
+
+# typed value of a field and its unit, e.g. "8192305094 ns (8.19s)" -> (8192305094, "ns"),
+# "[LinkedCells, VerletListsCells]" -> (["LinkedCells", "VerletListsCells"], None), "true" -> (True, None)
+def convert_slurm_field(text):
+    if text.lower() in ("true", "false"):
+        return text.lower() == "true", None
+
+    if text.startswith("[") and text.endswith("]"):
+        items = [item.strip() for item in text[1:-1].split(",")]
+        return [convert_slurm_field(item)[0] for item in items if item], None
+
+    match = slurm_number_pattern.match(text)
+    if match:
+        unit = slurm_unit_pattern.match(text, match.end())
+        if unit:
+            number = match.group()
+            if any(c in number for c in ".eE"):
+                return float(number), unit.group(1)
+            return int(number), unit.group(1)
+
+    return text, None
+
+
+# every field of the buffer in one scan, the first occurrence of a key wins
+def scan_slurm_fields(content, fields, units):
+    first = slurm_first_field_pattern.match(content)
+    for match in ([first] if first else []) + list(slurm_field_pattern.finditer(content)):
+        key = match.group(1).decode("utf-8", "replace")
+        if key in fields:
+            continue
+        value, unit = convert_slurm_field(match.group(2).decode("utf-8", "replace").rstrip())
+        fields[key] = value
+        if unit is not None:
+            units[key] = unit
+
+
+# the fields of the head and tail windows, cut to whole lines. the whole file is only scanned if a required
+# key is not found there. returns the fields, their units and whether the whole file was scanned
+def search_slurm_fields(head, tail, size, read_all, required):
+    fields, units = {}, {}
+    if len(head) + len(tail) >= size:
+        content = read_all()
+        scan_slurm_fields(content, fields, units)
+        count("slurm_bytes_read", size)
+        return fields, units, True
+
+    scan_slurm_fields(head[:head.rfind(b"\n") + 1], fields, units)
+    scan_slurm_fields(tail[tail.find(b"\n") + 1:], fields, units)
+    if all(key in fields for key in required):
+        count("slurm_bytes_read", len(head) + len(tail))
+        return fields, units, False
+
+    fields, units = {}, {}
+    scan_slurm_fields(read_all(), fields, units)
+    count("slurm_bytes_read", size)
+    return fields, units, True
+
+
+def parse_slurm_fields(file_path, required=()):
+    with span("parse_slurm_fields", file=file_path):
+        return search_slurm_file(file_path, lambda head, tail, size, read_all:
+                                 search_slurm_fields(head, tail, size, read_all, required))
+
+
+# parse(path, *args) of every file whose results are not in the cache, on a worker pool. returns one dict of the
+# results (named by `names`) per file, in the same order. a thread pool suits i/o bound parallel filesystems,
+# a process pool the cpu bound regex scanning. cached files that have the result_key (and that usable() accepts)
+# are answered from the stat alone and never reach the pool, the parsed ones are stored in the cache
+def parse_cached_files(cache, file_paths, parse, args, names, result_key, workers=None, executor="thread",
+                       usable=None):
+    results = [None] * len(file_paths)
+    stats = {}
+    missing = []
+
+    for i, file_path in enumerate(file_paths):
+        if cache is not None:
+            stats[i] = get_fs(file_path).stat(file_path)
+            entry = cache.lookup(file_path, stats[i], result_key)
+            if entry is not None and (usable is None or usable(entry)):
+                results[i] = entry
+                continue
+        missing.append(i)
+    count("slurm_cache_hits", len(file_paths) - len(missing))
+
+    if workers is None:
+        workers = min(32, os.cpu_count() or 1)
+    workers = max(1, min(workers, len(missing)))
+
+    paths = [file_paths[i] for i in missing]
+    if workers == 1:
+        parsed = [parse(path, *args) for path in paths]
     else:
-        pattern = re.compile(r"iterations\s+:\s+(\d+)")
+        pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+        chunksize = max(1, len(paths) // (workers * 4))
+        with pool_class(max_workers=workers) as pool:
+            parsed = list(pool.map(parse, paths, *[repeat(arg) for arg in args], chunksize=chunksize))
 
-    for folder in folders:
-        folder_path = os.path.join(base_path, folder)
-        for subfolder in os.listdir(folder_path):
-            if "frequency" in subfolder or "iteration" in subfolder:
-                subfolder_path = os.path.join(folder_path, subfolder)
+    for i, result in zip(missing, parsed):
+        results[i] = dict(zip(names, result))
+        if cache is not None:
+            cache.store(file_paths[i], stats[i], **results[i])
 
-                value_pattern = re.compile(r"[a-zA-Z0-9_-]+_(\d+)\.(\d+)")
+    return results
 
-                files_to_process = os.listdir(subfolder_path)
-                oldest_file = None
-                slurm_id = float('inf')
 
+# the (value, wall-clock ns) of the given .out files
+def parse_slurm_files(cache, file_paths, pattern, time_pattern, workers=None, executor="thread"):
+    results = parse_cached_files(cache, file_paths, parse_slurm_file, (pattern, time_pattern), ("value", "time_ns"),
+                                 "time_ns", workers, executor)
+    return [(result["value"], result["time_ns"]) for result in results]
 
 
-                if not is_percentage:
-                    for file in os.listdir(subfolder_path):
-                        if file.endswith(".out"):
-                            match = value_pattern.search(file)
+# the (fields, units) of the given .out files. a cached entry is used if the whole log was scanned for it
+# or it has all the required keys
+def parse_slurm_field_files(cache, file_paths, required, workers=None, executor="thread"):
+    required = tuple(required)
+    results = parse_cached_files(cache, file_paths, parse_slurm_fields, (required,), ("fields", "units", "complete"),
+                                 "fields", workers, executor,
+                                 lambda entry: entry["complete"] or all(key in entry["fields"] for key in required))
+    return [(result["fields"], result["units"]) for result in results]
 
-                            if match:
-                                d2 = int(match.group(2))  # Extract the second number (d2)
-                                if not is_percentage and d2 < slurm_id:
-                                    slurm_id = d2
-                                    oldest_file = file
 
-                    files_to_process = [oldest_file]
+# the key of the sweep value in the header, i.e. what the two fixed patterns of slurm_patterns read
+def slurm_value_key(base_path):
+    return "verlet-rebuild-frequency" if "frequency" in base_path else "iterations"
 
 
+SLURM_TIME_KEY = "Total wall-clock time"
 
-                times = []
-                value = -1
 
-                for file in files_to_process:
+# (x, y, valid) of every log for read_slurm, from the fields selected by the keys
+def read_slurm_keys(cache, file_paths, base_path, x_key=None, y_key=None, workers=None, executor="thread"):
+    x_key = x_key or slurm_value_key(base_path)
+    y_key = y_key or SLURM_TIME_KEY
+    parsed = parse_slurm_field_files(cache, file_paths, [x_key, y_key], workers, executor)
+    return select_slurm_fields(parsed, x_key, y_key)
 
-                    if file.endswith(".out"):
-                        file_path = os.path.join(subfolder_path, file)
 
-                        with open(file_path, "r") as f:
-                            content = f.read()
-                            value_match = pattern.search(content)
-                            time_match = time_pattern.search(content)
+# x and y of every log from its fields. timers are converted to seconds, logs without one of the keys
+# (e.g. runs that did not finish) are invalid. only numbers can be plotted, a key with text, lists or booleans
+# (e.g. container or traversal) or a key that is in none of the logs is a ValueError
+def select_slurm_fields(parsed, x_key, y_key):
+    def number(value):
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
 
-                            if value_match and time_match:
-                                value = int(value_match.group(1))
-                                time_ns = int(time_match.group(1))
-                                time_s = time_ns / 1e9
-                                times.append(time_s)
+    for key in (x_key, y_key):
+        values = [fields[key] for fields, _ in parsed if key in fields]
+        if parsed and not values:
+            raise ValueError(f'None of the logs has a field "{key}", see the fields command for the keys')
+        for value in values:
+            if not number(value):
+                raise ValueError(f'The field "{key}" is not a number (e.g. {value!r}) and can not be used as an axis')
 
-                                if not is_distribution_plot:
-                                    data[folder]["value"].append(value)
-                                    data[folder]["time"].append(time_s)
+    file_valid = np.array([number(fields.get(x_key)) and number(fields.get(y_key)) for fields, _ in parsed],
+                          dtype=bool)
+    x = [fields[x_key] if valid else -1 for (fields, _), valid in zip(parsed, file_valid)]
+    file_value = np.array(x, dtype=np.float64 if any(isinstance(v, float) for v in x) else np.int64)
+    file_y = np.array([fields[y_key] / TIME_UNITS.get(units.get(y_key), 1.0) if valid else 0
+                       for (fields, units), valid in zip(parsed, file_valid)], dtype=np.float64)
+    return file_value, file_y, file_valid
 
-                if is_distribution_plot:
-                    data[folder]["value"].append(value)
-                    data[folder]["time"].append(times)
 
-    return data
+def slurm_patterns(base_path):
+    time_pattern = re.compile(rb"Total wall-clock time\s+:\s+(\d+)\s+ns")
+
+    if "frequency" in base_path:
+        pattern = re.compile(rb"verlet-rebuild-frequency\s+:\s+(\d+)")
+    else:
+        pattern = re.compile(rb"iterations\s+:\s+(\d+)")
+
+    return pattern, time_pattern
+
+
+# x_key / y_key select other fields of the logs for the points and times of the table (see parse_slurm_fields),
+# by default they are the sweep value and the wall-clock time in seconds
+def read_slurm(folders, base_path, is_percentage, is_distribution_plot, use_cache=True, workers=None,
+               executor="thread", x_key=None, y_key=None):
+    pattern, time_pattern = slurm_patterns(base_path)
+
+    cache = SlurmCache(base_path) if use_cache else None
+    fs = get_fs(base_path)
+
+    # first collect the files of every sweep point, in a deterministic order
+    with span("read_slurm.discover", base_path=base_path):
+        sweep_folder = []
+        file_point = []
+        file_paths = []
+        for folder_code, folder in enumerate(folders):
+            folder_path = os.path.join(base_path, folder)
+            for subfolder in sorted(fs.listdir(folder_path)):
+                if "frequency" in subfolder or "iteration" in subfolder:
+                    subfolder_path = os.path.join(folder_path, subfolder)
+
+                    files_to_process = sorted(fs.listdir(subfolder_path))
+                    oldest_file = None
+                    slurm_id = float('inf')
+
 
 
-def read_and_process_csv(file_path, column_names, avg_window):
+                    if not is_percentage:
+                        for file in files_to_process:
+                            if file.endswith(".out"):
+                                match = slurm_file_pattern.search(file)
+
+                                if match:
+                                    d2 = int(match.group(2))  # Extract the second number (d2)
+                                    if d2 < slurm_id:
+                                        slurm_id = d2
+                                        oldest_file = file
+
+                        files_to_process = [oldest_file] if oldest_file is not None else []
+
+                    paths = [os.path.join(subfolder_path, file) for file in files_to_process if file.endswith(".out")]
+                    file_point.extend([len(sweep_folder)] * len(paths))
+                    sweep_folder.append(folder_code)
+                    file_paths.extend(paths)
+
+    with span("read_slurm.parse", files=len(file_paths)):
+        if x_key is not None or y_key is not None:
+            file_value, file_time_s, file_valid = read_slurm_keys(cache, file_paths, base_path, x_key, y_key, workers,
+                                                                  executor)
+        else:
+            parsed = parse_slurm_files(cache, file_paths, pattern, time_pattern, workers, executor)
+
+            file_valid = np.array([value is not None for value, _ in parsed], dtype=bool)
+            file_value = np.array([value if value is not None else -1 for value, _ in parsed], dtype=np.int64)
+            file_time_s = np.array([time_ns if value is not None else 0 for value, time_ns in parsed],
+                                   dtype=np.float64) / 1e9
+
+        if cache is not None:
+            cache.save()
+
+    return RunTable.from_parsed(folders, sweep_folder, file_point, file_value, file_time_s, file_valid,
+                                is_distribution_plot)
+
+
+def read_and_process_csv(file_path, column_names, avg_window, use_sidecar=True, chunksize=None):
+    from csv_io import load_windowed, read_csv_chunked
+
     try:
-        df = pd.read_csv(file_path, on_bad_lines='skip')
+        # streaming mode for files that do not fit into memory, no sidecar is written
+        if chunksize is not None:
+            with span("read_and_process_csv", file=file_path, mode="chunked"):
+                return read_csv_chunked(file_path, column_names, avg_window, chunksize)
+
+        if use_sidecar:
+            with span("read_and_process_csv", file=file_path, mode="sidecar"):
+                return load_windowed(file_path, column_names, avg_window)
 
-        # Ensure the relevant columns exist in the dataframe
-        if not all(col in df.columns for col in column_names):
-            raise ValueError(f"file doesn't contain the following columns: {column_names}")
+        with span("read_and_process_csv", file=file_path, mode="pandas"):
+            return process_csv(file_path, column_names, avg_window)
 
+    except Exception as e:
+        print(f"Error processing file {file_path}: {e}")
+        return None
+
+
+# the original pandas path, without the columnar sidecar
+def process_csv(file_path, column_names, avg_window):
+    import pandas as pd
+
+    fs = get_fs(file_path)
+    with span("csv.parse"), fs.open(file_path) as f:
+        df = pd.read_csv(f, on_bad_lines='skip')
+    count("csv_bytes_read", fs.stat(file_path).st_size)
+    rows_read = len(df)
+
+    # Ensure the relevant columns exist in the dataframe
+    if not all(col in df.columns for col in column_names):
+        raise ValueError(f"file doesn't contain the following columns: {column_names}")
+
+    with span("csv.clean"):
         num_columns = len(df.columns)  # Number of columns as per header
         df = df[df.notnull().sum(axis=1) == num_columns]
 
@@ -210,39 +629,49 @@ def read_and_process_csv(file_path, column_names, avg_window):
         df = df.drop_duplicates(subset=['Iteration'])
         df = df.sort_values(by='Iteration')
         df.reset_index(drop=True, inplace=True)
+    count("csv_rows_kept", len(df))
+    count("csv_rows_dropped", rows_read - len(df))
 
+    with span("csv.aggregate"):
         # get average of every 10 iterations
         df = df[column_names].groupby(df.index // avg_window).mean()
         df.reset_index(drop=True, inplace=True)
 
 
-        return df
+    return df
 
-    except Exception as e:
-        print(f"Error processing file {file_path}: {e}")
-        return None
+
+# the folders (branches) of a frequency_tests / iteration_tests folder, sorted by name, also inside an archive
+def list_folders(base_path):
+    fs = get_fs(base_path)
+    return sorted(f for f in fs.listdir(base_path) if fs.isdir(os.path.join(base_path, f)))
 
 
 def get_newest_csv(folder_path):
-    csv_files = [f for f in os.listdir(folder_path) if f.endswith('.csv')]
+    fs = get_fs(folder_path)
+    csv_files = [f for f in fs.listdir(folder_path) if f.endswith('.csv')]
 
     if not csv_files:
         return None
 
     csv_files_full_path = [os.path.join(folder_path, f) for f in csv_files]
 
-    newest_csv = max(csv_files_full_path, key=os.path.getmtime)
+    newest_csv = max(csv_files_full_path, key=fs.getmtime)
 
     return newest_csv
 
-def get_plotting_data(base_path, folder_name, value, column_names, mode, avg_window):
+def get_plotting_data(base_path, folder_name, value, column_names, mode, avg_window, catalog=None, chunksize=None):
     name = "frequency" if mode == 0 else "iteration"
     folder_path = os.path.join(base_path, folder_name, f'{name}_{value}')
-    file = get_newest_csv(folder_path)
+    with span("csv.discover", folder=folder_name, value=value):
+        if catalog is not None:
+            file = catalog.get_newest_csv(base_path, folder_name, value)
+        else:
+            file = get_newest_csv(folder_path)
     if file is None:
         raise TypeError(f'No .csv file in {folder_path}')
 
-    data = read_and_process_csv(file, column_names, avg_window)
+    data = read_and_process_csv(file, column_names, avg_window, chunksize=chunksize)
     if data is None:
         raise TypeError(f'Data in {folder_path} is none')
 
@@ -254,12 +683,14 @@ def extract_sorted_values(base_path):
     values = []
     pattern = re.compile(r'_(\d+)$')
 
-    for folder_name in os.listdir(base_path):
-        folder_path = os.path.join(base_path, folder_name)
-        if os.path.isdir(folder_path):
-            match = pattern.search(folder_name)
-            if match:
-                values.append(int(match.group(1)))
+    fs = get_fs(base_path)
+    with span("extract_sorted_values", path=base_path):
+        for folder_name in fs.listdir(base_path):
+            folder_path = os.path.join(base_path, folder_name)
+            if fs.isdir(folder_path):
+                match = pattern.search(folder_name)
+                if match:
+                    values.append(int(match.group(1)))
 
     return sorted(values)
 
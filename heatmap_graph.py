@@ -0,0 +1,128 @@
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from graph_utils import get_plotting_data, extract_sorted_values, find_yaml, use_backend
+use_backend()
+import matplotlib.pyplot as plt
+
+# more columns than a screen has pixels are not visible anyway
+MAX_HEATMAP_BINS = 2000
+
+
+# windowed series of every sweep value of one folder, loaded in one batch on a thread pool.
+# values without (valid) data are kept as None, so they show up as an empty row
+def load_sweep(base_path, folder, column_names, avg_window, catalog=None, workers=None):
+    mode = 0 if "frequency" in base_path else 1
+    if catalog is not None:
+        values = catalog.extract_sorted_values(base_path, folder)
+    else:
+        values = extract_sorted_values(os.path.join(base_path, folder))
+
+    def load(value):
+        try:
+            return get_plotting_data(base_path, folder, value, column_names, mode, avg_window, catalog)
+        except Exception as e:
+            print(f"Error loading {folder} {value}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        frames = list(executor.map(load, values))
+
+    return values, frames
+
+
+# aligns the series of all values on one common iteration grid of num_bins equally wide bins.
+# returns the bin centers and a (values x bins) array per column, NaN where a run has no data
+def align_sweep(frames, column_names, num_bins=None):
+    iteration_col = column_names[0]
+    rows = [i for i, frame in enumerate(frames) if frame is not None and not frame.empty]
+    if not rows:
+        return np.empty(0), {col: np.full((len(frames), 0), np.nan) for col in column_names[1:]}
+
+    iterations = [frames[i][iteration_col].to_numpy(dtype=np.float64) for i in rows]
+    lengths = np.array([len(it) for it in iterations])
+    iteration = np.concatenate(iterations)
+    row_of_point = np.repeat(np.array(rows), lengths)
+
+    if num_bins is None:
+        num_bins = min(int(lengths.max()), MAX_HEATMAP_BINS)
+
+    lo, hi = iteration.min(), iteration.max()
+    width = (hi - lo) / num_bins if hi > lo else 1.0
+    bins = np.minimum(((iteration - lo) / width).astype(np.int64), num_bins - 1)
+    flat = row_of_point * num_bins + bins
+
+    size = len(frames) * num_bins
+    counts = np.bincount(flat, minlength=size)
+    matrices = {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for col in column_names[1:]:
+            values = np.concatenate([frames[i][col].to_numpy(dtype=np.float64) for i in rows])
+            sums = np.bincount(flat, weights=values, minlength=size)
+            matrices[col] = (sums / counts).reshape(len(frames), num_bins)
+
+    centers = lo + (np.arange(num_bins) + 0.5) * width
+    return centers, matrices
+
+
+def plot(values, centers, matrices, folder, y_label, title, show=True):
+    fig, axes = plt.subplots(len(matrices), 1, figsize=(15, 5 * len(matrices)), squeeze=False)
+
+    if len(centers) > 1:
+        half_bin = (centers[1] - centers[0]) / 2
+    else:
+        half_bin = 0.5
+    extent = [centers[0] - half_bin, centers[-1] + half_bin, -0.5, len(values) - 0.5] if len(centers) else None
+
+    cmap = plt.get_cmap('viridis').copy()
+    cmap.set_bad('lightgrey')  # runs without data at that iteration
+
+    for ax, (col, matrix) in zip(axes[:, 0], matrices.items()):
+        image = ax.imshow(np.ma.masked_invalid(matrix), aspect='auto', origin='lower', interpolation='nearest',
+                          extent=extent, cmap=cmap)
+        colorbar = fig.colorbar(image, ax=ax)
+        colorbar.set_label(col, fontsize=14)
+
+        # a label for every value would overlap for long sweeps
+        step = max(1, len(values) // 20)
+        ax.set_yticks(range(0, len(values), step))
+        ax.set_yticklabels([str(v) for v in values[::step]])
+
+        ax.set_xlabel("Iteration", fontsize=16)
+        ax.set_ylabel(y_label, fontsize=16)
+        ax.set_title(f"{folder} - {col}", fontsize=16)
+        ax.tick_params(axis='both', which='major', labelsize=12)
+
+    fig.suptitle(title, fontsize=18)
+    fig.tight_layout()
+
+    if show:
+        plt.show()
+    return fig
+
+
+# iteration x sweep value heatmap of the given columns of one folder, column_names[0] is the iteration column
+def plot_heatmap(base_path, folder, column_names, avg_window, catalog=None, num_bins=None, show=True):
+    if catalog is not None:
+        yaml_file_name, yaml_file_path = catalog.find_yaml(base_path)
+    else:
+        yaml_file_name, yaml_file_path = find_yaml(base_path)
+    y_label = "Frequency" if "frequency" in base_path else "Iteration"
+
+    values, frames = load_sweep(base_path, folder, column_names, avg_window, catalog)
+    if not values:
+        print(f"No values found in {os.path.join(base_path, folder)}")
+        return None
+
+    centers, matrices = align_sweep(frames, column_names, num_bins)
+    title = f"{y_label} sweep in {yaml_file_name}"
+
+    return plot(values, centers, matrices, folder, y_label, title, show)
+
+
+if __name__ == "__main__":
+
+    base_path = ""
+    folder = "fastParticleBuffer"
+    columns = ['Iteration', 'computeInteractions[ns]', 'rebuildNeighborLists[ns]']
+    plot_heatmap(base_path, folder, columns, 100)
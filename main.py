@@ -1,107 +1,307 @@
 import os
-from functools import partial
-from graph_utils import PlotInfo, find_yaml, print_yaml_file
-from runtime_graph import plot_runtime, PlotType as PlotTypeRuntime
-from csv_analyzer_graph import PlotType as PlotTypeCSV, CsvAnalyzer
-from distribution_graph import plot_distribution_graph, PlotType as PlotTypeDistribution
+import argparse
+
+# only argparse is imported up front, every command imports the modules it needs itself.
+# commands writing files instead of opening a window select the Agg backend before matplotlib is imported
+
+# command -> name of the plot in csv_analyzer_graph.CSV_PLOTS
+CSV_COMMANDS = {
+    # Compare Compute Interactions in DVL and FP
+    # Compare Remainder Traversal in DVL and FP
+    "compare-dvl-fp": "compare_dvl_fp",
+    # Compute Interactions vs Remainder Traversal in Fast Particle Buffer
+    "ci-vs-rt": "ci_vs_rt_fp",
+    # Number of Particles in Buffer vs in Container in FastParticleBuffer
+    "buffer-vs-container": "buffer_vs_container",
+    # Number of Fast Particles found every Iteration in FastParticleBuffer
+    "fast-particles": "fast_particles",
+}
+
+HEATMAP_COLUMNS = ['Iteration', 'computeInteractions[ns]', 'rebuildNeighborLists[ns]']
+
+
+# profiling has to be switched on before the plot modules are imported
+def use_profiling(args):
+    if args.trace:
+        os.environ["GRAPHVIEW_PROFILE"] = args.trace
+    elif args.profile:
+        os.environ["GRAPHVIEW_PROFILE"] = "1"
+
+
+def use_headless_backend(args):
+    if getattr(args, "output", None) or getattr(args, "output_dir", None):
+        os.environ["GRAPHVIEW_BACKEND"] = "Agg"
+
+
+def open_catalog(args):
+    if args.catalog is None:
+        return None
+    from catalog import Catalog
+    return Catalog(args.catalog)
+
+
+def print_experiment(base_path, catalog):
+    from graph_utils import find_yaml, print_yaml_file
+
+    if catalog is not None:
+        yaml_file_name, yaml_file_path = catalog.find_yaml(base_path)
+    else:
+        yaml_file_name, yaml_file_path = find_yaml(base_path)
+
+    print("\n\n===========================================================================")
+    print(f"path: {base_path}")
+    print("===========================================================================\n\n\n")
+
+    print_yaml_file(yaml_file_path)
+
+
+def save_figure(fig, output):
+    import matplotlib.pyplot as plt
+
+    if fig is None:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    fig.savefig(output, bbox_inches="tight")
+    plt.close(fig)
+    print(f"Saved {output}")
 
-folders = ["fastParticleBuffer", "dynamicVLMerge"]
 
 # Time vs Frequency or vs Iterations
-def runtime(base_path):
-    ### plot_runtime will by default plot all folders in path, which sometimes is not ideal
-    # it takes a folders param, which is recommended to be set depending on what experiment you are running
-
-    folders_percentages = ["fastParticleBuffer10", "fastParticleBuffer15", "fastParticleBuffer20", "fastParticleBuffer30", "dynamicVLMerge"]
-
-    plot_runtime(base_path, PlotTypeRuntime.SCATTER_PLOT, folders)
-
-# Compare Compute Interactions in DVL and FP
-# Compare Remainder Traversal in DVL and FP
-def compare_dvl_fp(base_path):
-    col = ['computeInteractions[ns]', 'rebuildNeighborLists[ns]']
-    columns = ['Iteration', col[0], 'remainderTraversal[ns]']
-    plot_info = PlotInfo('Iteration', 'Time [ns]', 'Graph')
-    cvs_anal = CsvAnalyzer(base_path, columns, plot_info, PlotTypeCSV.DOUBLE_PLOT, 100, folders)
-    cvs_anal.create_window()
-
-# Number of Particles in Buffer vs in Container in FastParticleBuffer
-def buffer_vs_container(base_path):
-    #numberFastParticles
-    columns = ['Iteration', 'particleBufferSize', 'numberOfParticlesInContainer']
-    plot_info = PlotInfo('Iteration', 'Number of Particles in Buffer', 'Graph')
-    cvs_anal = CsvAnalyzer(base_path, columns, plot_info, PlotTypeCSV.SINGLE_PLOT, 1, ["fastParticleBuffer"])
-    cvs_anal.create_window()
-
-def fast_particles(base_path):
-    #numberFastParticles
-    columns = ['Iteration', 'numberFastParticles']
-    plot_info = PlotInfo('Iteration', 'particleBufferSize', 'Graph')
-    cvs_anal = CsvAnalyzer(base_path, columns, plot_info, PlotTypeCSV.SINGLE_PLOT, 1, ["fastParticleBuffer"])
-    cvs_anal.create_window()
-
-# Compute Interactions vs Remainder Traversal in Fast Particle Buffer
-# avg_window -> the grouping of iterations in the csv file, to take the average from
-def ci_vs_rt_fp(base_path):
-    columns = ['Iteration', 'remainderTraversal[ns]', 'computeInteractions[ns]']
-    plot_info = PlotInfo('Iteration', 'Time [ns]', 'Graph')
-
-    cvs_anal = CsvAnalyzer(base_path, columns, plot_info, PlotTypeCSV.SINGLE_PLOT, 100, folders)
-    cvs_anal.create_window()
+def runtime(args):
+    use_headless_backend(args)
+    from runtime_graph import plot_runtime, PlotType
+
+    catalog = open_catalog(args)
+    if not args.output:
+        print_experiment(args.base_path, catalog)
+
+    fig = plot_runtime(args.base_path, PlotType[f"{args.type.upper()}_PLOT"], args.folders or [], catalog,
+                       show=not args.output, x_key=args.x_key, y_key=args.y_key, workers=args.workers,
+                       executor=args.executor)
+    if args.output:
+        save_figure(fig, args.output)
+
 
 # Distribution Plots for repeated percentage experiments
 # Includes Violin and Box plots
-def distribution_plots(base_path, plot_type: PlotTypeDistribution):
-    folders = ["fastParticleBuffer0", "fastParticleBuffer01", "fastParticleBuffer001", "fastParticleBuffer0001",
-                     "fastParticleBuffer1", "fastParticleBuffer5", "fastParticleBuffer05", "dynamicVLMerge"]
-    plot_distribution_graph(base_path, plot_type, folders)
+def distribution(args):
+    use_headless_backend(args)
+    from distribution_graph import plot_distribution_graph, PlotType
 
-if __name__ == "__main__":
+    catalog = open_catalog(args)
+    if not args.output:
+        print_experiment(args.base_path, catalog)
 
+    fig = plot_distribution_graph(args.base_path, PlotType[f"{args.type.upper()}_PLOT"], args.folders or [], catalog,
+                                  show=not args.output, x_key=args.x_key, y_key=args.y_key, workers=args.workers,
+                                  executor=args.executor)
+    if args.output:
+        save_figure(fig, args.output)
 
 
-    base_path = os.getcwd()
+# the csv plots open the window with the value dropdown, or write one figure per value into --output-dir
+def csv_plot(args):
+    use_headless_backend(args)
+    from csv_analyzer_graph import CsvAnalyzer, CSV_PLOTS
 
-    yaml_file_name, yaml_file_path = find_yaml(base_path)
+    name = CSV_COMMANDS[args.command]
+    columns, plot_info, plot_type, avg_window, folders = CSV_PLOTS[name]
+    catalog = open_catalog(args)
 
+    analyzer = CsvAnalyzer(args.base_path, columns, plot_info, plot_type, args.avg_window or avg_window,
+                           args.folders or folders, catalog, live=args.live)
 
-    plots = [
-        ("Runtime throughout iterations or frequencies", lambda: runtime(base_path)),
-        ("Compare Dynamic VL Merge and Fast Particle Buffer", lambda: compare_dvl_fp(base_path)),
-        ("Compute Interactions vd Remainder Traversal in Fast Particle Buffer", lambda: ci_vs_rt_fp(base_path)),
-        ("Number of Particles in Buffer vs in Container in FastParticleBuffer", lambda: buffer_vs_container(base_path)),
-        ("Number of Fast Particles found every Iteration in FastParticleBuffer", lambda: fast_particles(base_path)),
-        ("Distribution Plots for repeated percentage experiments (Box)",
-         lambda: distribution_plots(base_path, PlotTypeDistribution.BOX_PLOT))
-    ]
+    if not args.output_dir:
+        print_experiment(args.base_path, catalog)
+        analyzer.create_window()
+        return
 
+    import matplotlib.pyplot as plt
+    try:
+        for value in args.values or analyzer.values:
+            fig = plt.figure(figsize=(15, 9))
+            analyzer.render(value, fig)
+            save_figure(fig, os.path.join(args.output_dir, f"{name}_{value}.{args.format}"))
+    finally:
+        analyzer.loader.shutdown(wait=False, cancel_futures=True)
+        analyzer.cache.close()
 
-    # You can try wrapping the following code in a while loop.
-    # However, tkinter requires the usage of the main thread, hence it can be buggy or even lead to failure
 
-    print("\nAvailable values:")
-    for idx, (plot_name, _) in enumerate(plots):
-        print(f"{idx}: {plot_name}")
-    user_input = input("Pick an index (or 'q' to quit): ")
-    if user_input.lower() == 'q':
-        print("Exiting...")
+# Iteration x Frequency (or Iteration) heatmap over all values of the sweep at once
+def heatmap(args):
+    use_headless_backend(args)
+    from heatmap_graph import plot_heatmap
 
-    try:
-        choice_idx = int(user_input)
-        chosen_plot_function = plots[choice_idx][1]
+    catalog = open_catalog(args)
+    fig = plot_heatmap(args.base_path, args.folder, ['Iteration'] + args.columns, args.avg_window, catalog,
+                       show=not args.output)
+    if args.output:
+        save_figure(fig, args.output)
+
+
+# mean, sum, median, p95 and std of every folder, value and column, without any plotting
+def stats(args):
+    import pandas as pd
+    from statistics import compute_sweep_statistics, export_statistics, stack_statistics, rank_folders, \
+        compute_difference_matrices, speedup_tables
+
+    catalog = open_catalog(args)
+    folders = args.folders
+    if not folders:
+        if catalog is not None:
+            folders = catalog.folders(args.base_path)
+        else:
+            from graph_utils import list_folders
+            folders = list_folders(args.base_path)
 
-        print("\n\n===========================================================================")
-        print(f"path: {base_path}")
-        print("===========================================================================\n\n\n")
+    table = compute_sweep_statistics(args.base_path, folders, args.columns, args.avg_window, args.values, catalog,
+                                     args.workers)
 
-        print_yaml_file(yaml_file_path)
+    if args.output:
+        export_statistics(table, args.output)
+        print(f"Saved {args.output}")
+    else:
+        with pd.option_context("display.max_rows", None, "display.width", 200):
+            print(table.to_string(index=False))
 
-        chosen_plot_function()
-    except (ValueError, IndexError):
-        print("Invalid choice, please try again.")
+    if args.rank:
+        folders, values, columns, stacked = stack_statistics(table, "mean", folders, columns=args.columns)
+        ranking = rank_folders(folders, values, columns, stacked)
+        print("\nFastest folders (by mean):")
+        print(ranking[ranking["rank"] == 1].to_string(index=False))
 
+        differences, speedups = compute_difference_matrices(stacked)
+        for column, speedup in speedup_tables(folders, columns, speedups).items():
+            print(f"\nSpeedup of the row over the column folder in {column} (mean over all values):")
+            print(speedup.to_string(float_format="{:.3f}".format))
 
 
+# every "key : value" field of the given logs, to find the keys for --x-key / --y-key
+def fields(args):
+    from graph_utils import parse_slurm_fields
 
+    for path in args.files:
+        values, units, complete = parse_slurm_fields(path)
+        print(f"{path}:")
+        for key, value in values.items():
+            unit = f" {units[key]}" if key in units else ""
+            print(f"  {key:<40}{value!r}{unit}")
 
 
+def batch(args):
+    from batch_render import render_all
+    render_all(args.root, args.out_dir, tuple(args.formats), args.workers, args.force)
+
+
+def make_catalog(args):
+    from catalog import build_catalog
+    build_catalog(args.root, args.catalog_path, args.workers)
+
+
+def watch_sweep(args):
+    from watch import watch_runtime, watch_distribution
+
+    if args.distribution:
+        from distribution_graph import PlotType
+        watch_distribution(args.base_path, PlotType[f"{args.distribution.upper()}_PLOT"], args.folders or [],
+                           int(args.interval * 1000))
+    else:
+        watch_runtime(args.base_path, args.folders or [], int(args.interval * 1000))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py", description="Plots and statistics of the frequency / iteration experiments.")
+    parser.add_argument("--profile", action="store_true", help="print the time spent in every stage at the end")
+    parser.add_argument("--trace", help="profile and write a Chrome trace (.json) of the stages to this file")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="command")
+
+    # options shared by the commands reading one frequency_tests / iteration_tests folder
+    experiment = argparse.ArgumentParser(add_help=False)
+    experiment.add_argument("base_path", nargs="?", default=os.getcwd(),
+                            help="the frequency_tests or iteration_tests folder (default: current directory)")
+    experiment.add_argument("--folders", nargs="+", help="folders (branches) to use, e.g. fastParticleBuffer dynamicVLMerge")
+
+    # not offered by watch, which polls the folders for runs the catalog does not know about yet
+    catalog = argparse.ArgumentParser(add_help=False)
+    catalog.add_argument("--catalog", help="read from this experiments catalog instead of the folders")
+
+    # fields of the slurm logs used instead of the sweep value / wall-clock time, see the fields command
+    keys = argparse.ArgumentParser(add_help=False)
+    keys.add_argument("--x-key", help="numeric field of the logs on the x-axis, e.g. cutoff")
+    keys.add_argument("--y-key", help="numeric field of the logs on the y-axis, timers are converted to seconds")
+
+    # pool the slurm logs are parsed on
+    pool = argparse.ArgumentParser(add_help=False)
+    pool.add_argument("--workers", type=int, help="number of workers parsing the logs (default: one per cpu)")
+    pool.add_argument("--executor", choices=["thread", "process"], default="thread",
+                      help="threads suit slow (network) file systems, processes the regex scanning of large logs")
+
+    command = commands.add_parser("runtime", parents=[experiment, catalog, keys, pool],
+                                  help="time vs frequency or iteration")
+    command.add_argument("--type", choices=["scatter", "stem", "bar"], default="scatter")
+    command.add_argument("--output", help="save the figure to this file instead of showing it")
+    command.set_defaults(handler=runtime)
+
+    for name in CSV_COMMANDS:
+        command = commands.add_parser(name, parents=[experiment, catalog], help=f"{CSV_COMMANDS[name]} csv plot")
+        command.add_argument("--avg-window", type=int, help="number of iterations averaged into one point")
+        command.add_argument("--values", nargs="+", type=int, help="values to save (default: all)")
+        command.add_argument("--output-dir", help="save one figure per value here instead of opening a window")
+        command.add_argument("--format", default="png", help="file format of the saved figures")
+        command.add_argument("--live", action="store_true", help="follow csv files that are still being written")
+        command.set_defaults(handler=csv_plot)
+
+    command = commands.add_parser("distribution", parents=[experiment, catalog, keys, pool],
+                                  help="box / violin plots of repeated percentage experiments")
+    command.add_argument("--type", choices=["box", "violin"], default="box")
+    command.add_argument("--output", help="save the figure to this file instead of showing it")
+    command.set_defaults(handler=distribution)
+
+    command = commands.add_parser("heatmap", parents=[experiment, catalog], help="iteration x value heatmap of one folder")
+    command.add_argument("--folder", default="fastParticleBuffer")
+    command.add_argument("--columns", nargs="+", default=HEATMAP_COLUMNS[1:])
+    command.add_argument("--avg-window", type=int, default=100)
+    command.add_argument("--output", help="save the figure to this file instead of showing it")
+    command.set_defaults(handler=heatmap)
+
+    command = commands.add_parser("stats", parents=[experiment, catalog], help="statistics table of a whole sweep")
+    command.add_argument("--columns", nargs="+", required=True)
+    command.add_argument("--avg-window", type=int, default=1)
+    command.add_argument("--values", nargs="+", type=int, help="values to use (default: all)")
+    command.add_argument("--workers", type=int)
+    command.add_argument("--output", help="write the table to a .csv or .parquet file instead of printing it")
+    command.add_argument("--rank", action="store_true", help="print the fastest folder of every value and column and the speedups of all pairs of folders")
+    command.set_defaults(handler=stats)
+
+    command = commands.add_parser("fields", help="print the fields of slurm .out files")
+    command.add_argument("files", nargs="+")
+    command.set_defaults(handler=fields)
+
+    command = commands.add_parser("batch", help="render every figure of an experiment tree into files")
+    command.add_argument("root")
+    command.add_argument("out_dir")
+    command.add_argument("--formats", nargs="+", default=["png"])
+    command.add_argument("--workers", type=int)
+    command.add_argument("--force", action="store_true", help="render figures whose inputs did not change as well")
+    command.set_defaults(handler=batch)
+
+    command = commands.add_parser("catalog", help="build the experiments catalog of an experiment tree")
+    command.add_argument("root")
+    command.add_argument("--catalog-path")
+    command.add_argument("--workers", type=int)
+    command.set_defaults(handler=make_catalog)
+
+    command = commands.add_parser("watch", parents=[experiment], help="live plot of a sweep that is still running")
+    command.add_argument("--distribution", choices=["box", "violin"], help="watch a distribution plot instead")
+    command.add_argument("--interval", type=float, default=5, help="seconds between two polls")
+    command.set_defaults(handler=watch_sweep)
+
+    return parser
+
+
+if __name__ == "__main__":
+
+    args = build_parser().parse_args()
+    use_profiling(args)
+    args.handler(args)
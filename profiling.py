@@ -0,0 +1,149 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+
+# GRAPHVIEW_PROFILE=1 prints a summary of the stages when the program exits,
+# GRAPHVIEW_PROFILE=<file>.json writes a Chrome trace (open it in Perfetto or chrome://tracing) as well
+PROFILE_ENV = "GRAPHVIEW_PROFILE"
+
+enabled = False
+trace_path = None
+
+events = []  # (name, start ns, duration ns, thread id, args), list.append is atomic so threads share it
+counters = {}
+counters_lock = threading.Lock()
+thread_names = {}
+local = threading.local()
+origin_ns = time.perf_counter_ns()
+
+
+class Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        stack = getattr(local, "stack", None)
+        if stack is None:
+            stack = local.stack = []
+            thread_names[threading.get_ident()] = threading.current_thread().name
+        stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter_ns()
+        local.stack.pop()
+        events.append((self.name, self.start, end - self.start, threading.get_ident(), self.args))
+        return False
+
+
+# returned while profiling is off, entering it does nothing
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+# with span("read_slurm.parse", files=n): ... times the block, the keyword arguments show up in the trace
+def span(name, **args):
+    if not enabled:
+        return NULL_SPAN
+    return Span(name, args)
+
+
+# adds value to a counter of the summary and to the arguments of the innermost open span of this thread,
+# so per-file spans carry their own bytes and rows in the trace
+def count(name, value):
+    if not enabled:
+        return
+    with counters_lock:
+        counters[name] = counters.get(name, 0) + value
+    stack = getattr(local, "stack", None)
+    if stack:
+        args = stack[-1].args
+        args[name] = args.get(name, 0) + value
+
+
+# times every draw of a figure. the rendering happens in plt.show() / savefig, not in the plot functions
+def trace_draws(fig, name):
+    if not enabled or getattr(fig, "traced_draws", False):
+        return
+    fig.traced_draws = True
+    draw = fig.draw
+
+    def traced_draw(renderer):
+        with Span(name, {}):
+            return draw(renderer)
+
+    fig.draw = traced_draw
+
+
+def enable(path=None):
+    global enabled, trace_path
+    if not enabled:
+        atexit.register(report)
+    enabled = True
+    trace_path = path
+
+
+# calls, total, mean and max time per span name, slowest first, followed by the counters
+def summary():
+    totals = {}
+    for name, start, duration, tid, args in list(events):
+        calls, total, longest = totals.get(name, (0, 0, 0))
+        totals[name] = (calls + 1, total + duration, max(longest, duration))
+
+    lines = [f"{'stage':<36}{'calls':>8}{'total ms':>12}{'mean ms':>12}{'max ms':>12}"]
+    for name, (calls, total, longest) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        lines.append(f"{name:<36}{calls:>8}{total / 1e6:>12.2f}{total / calls / 1e6:>12.3f}{longest / 1e6:>12.2f}")
+
+    if counters:
+        lines.append("")
+        lines.append(f"{'counter':<36}{'total':>20}")
+        for name, value in sorted(counters.items()):
+            lines.append(f"{name:<36}{value:>20,}")
+    return "\n".join(lines)
+
+
+# chrome trace-event format: one complete ("X") event per span, timestamps in microseconds
+def write_trace(path):
+    pid = os.getpid()
+    trace = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+             for tid, name in thread_names.items()]
+    trace.extend({"name": name, "cat": "graphview", "ph": "X", "pid": pid, "tid": tid,
+                  "ts": (start - origin_ns) / 1e3, "dur": duration / 1e3, "args": args}
+                 for name, start, duration, tid, args in list(events))
+
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f, default=str)
+
+
+def report():
+    if not events:
+        return
+    print("\n" + summary(), file=sys.stderr)
+    if trace_path is not None:
+        try:
+            write_trace(trace_path)
+            print(f"Saved trace {trace_path}", file=sys.stderr)
+        except OSError as e:
+            print(f"Could not write trace {trace_path}: {e}", file=sys.stderr)
+
+
+setting = os.environ.get(PROFILE_ENV, "")
+if setting not in ("", "0"):
+    enable(setting if setting.endswith(".json") else None)
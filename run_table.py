@@ -0,0 +1,143 @@
+import numpy as np
+
+
+# integer sweep values, or floats if a float field of the logs is used as x
+def as_values(values):
+    values = np.asarray(values)
+    return values.astype(np.float64 if values.dtype.kind == 'f' and values.size else np.int64)
+
+
+# results of the slurm runs of a sweep in a columnar layout shared by the plot modules.
+# every sweep point (folder, value) owns the run times times[offsets[i]:offsets[i + 1]], so repeated runs
+# (distribution plots) and single runs (runtime plots) use the same arrays.
+# the points are kept grouped by folder, in the order of `folders`
+class RunTable:
+    def __init__(self, folders, point_folder, point_value, offsets, times):
+        self.folders = list(folders)
+        self.point_folder = np.asarray(point_folder, dtype=np.int32)
+        self.point_value = as_values(point_value)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.times = np.asarray(times, dtype=np.float64)
+
+        if np.any(self.point_folder[1:] < self.point_folder[:-1]):
+            order = np.argsort(self.point_folder, kind='stable')
+            self.point_folder, self.point_value, self.offsets, self.times = self.take_points(order)
+
+        self.folder_codes = {folder: i for i, folder in enumerate(self.folders)}
+        self.folder_offsets = np.searchsorted(self.point_folder, np.arange(len(self.folders) + 1))
+        self.index = None
+
+    # one point per run, e.g. runtime plots
+    @classmethod
+    def from_runs(cls, folders, run_folder, run_value, run_time):
+        return cls(folders, run_folder, run_value, np.arange(len(run_time) + 1), run_time)
+
+    # builds the table from parsed .out files. file_point is the (non decreasing) sweep point of every file,
+    # files without a result are marked in file_valid. distribution plots keep one point per sweep point
+    # with all of its runs (value -1 if none of them finished), the other plots one point per finished run
+    @classmethod
+    def from_parsed(cls, folders, sweep_folder, file_point, file_value, file_time_s, file_valid, is_distribution_plot):
+        sweep_folder = np.asarray(sweep_folder, dtype=np.int32)
+        file_point = np.asarray(file_point, dtype=np.int64)[file_valid]
+        file_value = as_values(file_value)[file_valid]
+        file_time_s = np.asarray(file_time_s, dtype=np.float64)[file_valid]
+
+        if not is_distribution_plot:
+            return cls.from_runs(folders, sweep_folder[file_point], file_value, file_time_s)
+
+        counts = np.bincount(file_point, minlength=len(sweep_folder))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        # the value of a sweep point is the one of its last finished run
+        point_value = np.full(len(sweep_folder), -1, dtype=file_value.dtype)
+        last = np.flatnonzero(np.r_[file_point[1:] != file_point[:-1], True]) if len(file_point) else []
+        point_value[file_point[last]] = file_value[last]
+
+        return cls(folders, sweep_folder, point_value, offsets, file_time_s)
+
+    def __len__(self):
+        return len(self.point_value)
+
+    # (folder, value, offsets, times) of the points in the given order
+    def take_points(self, order):
+        counts = np.diff(self.offsets)[order]
+        starts = self.offsets[:-1][order]
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        run_index = np.repeat(starts - offsets[:-1], counts) + np.arange(offsets[-1])
+        return self.point_folder[order], self.point_value[order], offsets, self.times[run_index]
+
+    def point_range(self, folder):
+        code = self.folder_codes[folder]
+        return self.folder_offsets[code], self.folder_offsets[code + 1]
+
+    def values(self, folder):
+        start, end = self.point_range(folder)
+        return self.point_value[start:end]
+
+    # the times of the first run of every point of a folder, NaN for points without runs
+    def first_times(self, folder):
+        start, end = self.point_range(folder)
+        offsets = self.offsets[start:end + 1]
+        first = np.full(end - start, np.nan)
+        has_runs = offsets[1:] > offsets[:-1]
+        first[has_runs] = self.times[offsets[:-1][has_runs]]
+        return first
+
+    # the run times of every point of a folder
+    def repeats(self, folder):
+        start, end = self.point_range(folder)
+        offsets = self.offsets[start:end + 1]
+        return np.split(self.times[offsets[0]:offsets[-1]], offsets[1:-1] - offsets[0])
+
+    # the run times of one point (None if the folder has no such value), in O(1) after the first call.
+    # the first point wins if a value appears twice in a folder, like in pivot
+    def lookup(self, folder, value):
+        if self.index is None:
+            self.index = {}
+            for i, key in enumerate(zip(self.point_folder.tolist(), self.point_value.tolist())):
+                self.index.setdefault(key, i)
+        point = self.index.get((self.folder_codes[folder], value))
+        if point is None:
+            return None
+        return self.times[self.offsets[point]:self.offsets[point + 1]]
+
+    def max_time(self, folders=None):
+        if folders is None:
+            folders = self.folders
+        maxima = [self.times[self.offsets[start]:self.offsets[end]].max() for start, end in map(self.point_range, folders)
+                  if self.offsets[end] > self.offsets[start]]
+        return max(maxima, default=0)
+
+    # the points sorted by value inside every folder
+    def sorted(self):
+        order = np.lexsort((self.point_value, self.point_folder))
+        return RunTable(self.folders, *self.take_points(order))
+
+    # the given folders only, in the given order
+    def select(self, folders):
+        order = np.concatenate([np.arange(*self.point_range(folder)) for folder in folders] + [np.empty(0, dtype=np.int64)])
+        point_folder, point_value, offsets, times = self.take_points(order)
+        lengths = [self.point_range(folder)[1] - self.point_range(folder)[0] for folder in folders]
+        point_folder = np.repeat(np.arange(len(folders)), lengths)
+        return RunTable(folders, point_folder, point_value, offsets, times)
+
+    # dense folder x value grid of the first run time of every point. returns the sorted values,
+    # the grid and a mask which is True where a folder has no finished run of a value (e.g. a timeout)
+    def pivot(self, folders=None):
+        table = self if folders is None else self.select(folders)
+        values = np.unique(table.point_value)
+
+        column = np.searchsorted(values, table.point_value)
+        cells = table.point_folder.astype(np.int64) * len(values) + column
+        first_times = np.concatenate([table.first_times(folder) for folder in table.folders] + [np.empty(0)])
+        finished = ~np.isnan(first_times)
+
+        grid = np.zeros(len(table.folders) * len(values))
+        mask = np.ones(len(table.folders) * len(values), dtype=bool)
+        # the first point wins if a value appears twice in a folder
+        cells_finished, first = np.unique(cells[finished], return_index=True)
+        grid[cells_finished] = first_times[finished][first]
+        mask[cells_finished] = False
+
+        shape = (len(table.folders), len(values))
+        return values, grid.reshape(shape), mask.reshape(shape)
@@ -1,11 +1,15 @@
 import os
 from enum import Enum
-import matplotlib
-import matplotlib.pyplot as plt
 import numpy as np
+from graph_utils import PlotInfo, PointIndex, map_folders_to_colors, sort_criteria, find_yaml, read_slurm, \
+    use_backend
+use_backend()
+import matplotlib.pyplot as plt
 from matplotlib.ticker import MaxNLocator
 import matplotlib.patches as mpatches
-from graph_utils import PlotInfo, map_folders_to_colors, sort_criteria, find_yaml, read_slurm
+from experiment_fs import get_fs
+from run_table import RunTable
+from profiling import span, trace_draws
 
 
 
@@ -15,29 +19,27 @@ class PlotType(Enum):
     BAR_PLOT = 3
 
 def merge_folders(data, folder1, folder2, merged_folder_name):
-    if folder1 not in data or folder2 not in data:
+    if folder1 not in data.folders or folder2 not in data.folders:
         raise KeyError("One or both folders not found in data.")
 
-    values1, times1 = data[folder1]["value"], data[folder1]["time"]
-    values2, times2 = data[folder2]["value"], data[folder2]["time"]
-
-    time_dict1 = dict(zip(values1, times1))
-    time_dict2 = dict(zip(values2, times2))
+    values, times, missing = data.pivot([folder1, folder2])
 
-    if set(time_dict1.keys()) != set(time_dict2.keys()):
+    if (missing[0] != missing[1]).any():
         raise ValueError("The two folders do not contain the same values.")
 
-    merged_values = sorted(time_dict1.keys())  # Keep a sorted order
-    merged_times = [time_dict1[val] + time_dict2[val] for val in merged_values]
+    merged = ~missing[0]
+    merged_values = values[merged]  # Keep a sorted order
+    merged_times = times[0, merged] + times[1, merged]
 
-    data[merged_folder_name] = {"value": merged_values, "time": merged_times}
+    folders = [folder for folder in data.folders if folder not in (folder1, folder2)]
+    point_folder = np.repeat(np.arange(len(folders) + 1), [len(data.values(folder)) for folder in folders] + [len(merged_values)])
+    point_value = np.concatenate([data.values(folder) for folder in folders] + [merged_values])
+    point_time = np.concatenate([data.first_times(folder) for folder in folders] + [merged_times])
 
-    del data[folder1]
-    del data[folder2]
+    return RunTable.from_runs(folders + [merged_folder_name], point_folder, point_value, point_time)
 
-    return data
 
-def plot_bar(data, folders, plot_info):
+def plot_bar(data, folders, plot_info, show=True):
     folders = sorted(folders, key=sort_criteria)
     colors = map_folders_to_colors(folders)
 
@@ -46,40 +48,37 @@ def plot_bar(data, folders, plot_info):
     bar_width = 0.2  # Width of each bar
     num_folders = len(folders)
 
-    all_x_values = sorted(set(val for folder in folders for val in data[folder]["value"]))
-    x_positions = {val: i for i, val in enumerate(all_x_values)}
+    # folder x value grid, missing marks the values a folder has no finished run of
+    all_x_values, times, missing = data.pivot(folders)
+    x_positions = np.arange(len(all_x_values))
 
-    timeout_detected = False  # Track if any timeouts occur
+    timeout_detected = bool(missing.any())  # Track if any timeouts occur
 
     for i, folder in enumerate(folders):
-        x_values = np.array(data[folder]["value"])
-        y_values = np.array(data[folder]["time"])
-
-        x = np.array([x_positions[val] for val in x_values])
+        finished = ~missing[i]
 
         ax.bar(
-            x + (i - (num_folders - 1) / 2) * bar_width,  # Adjust x-position for centering
-            y_values,
+            x_positions[finished] + (i - (num_folders - 1) / 2) * bar_width,  # Adjust x-position for centering
+            times[i, finished],
             width=bar_width,
             color=colors[folder],
             label=folder,
         )
 
-    # Check for missing data and add "timeout" bars
-    for val, pos in x_positions.items():
-        for i, folder in enumerate(folders):
-            if val not in data[folder]["value"]:  # If missing
-                timeout_detected = True
-                ax.bar(
-                    pos + (i - (num_folders - 1) / 2) * bar_width,
-                    max([max(data[f]["time"]) for f in folders]),  # Approximate max height
-                    width=bar_width,
-                    color='gray',
-                    hatch='//',  # Crosshatch pattern
-                )
+    # Add "timeout" bars for the missing data
+    timeout_height = data.max_time(folders)  # Approximate max height
+    for i, folder in enumerate(folders):
+        if missing[i].any():
+            ax.bar(
+                x_positions[missing[i]] + (i - (num_folders - 1) / 2) * bar_width,
+                timeout_height,
+                width=bar_width,
+                color='gray',
+                hatch='//',  # Crosshatch pattern
+            )
 
     # Compute center positions for x-axis labels
-    x_tick_positions = [pos for pos in x_positions.values()]
+    x_tick_positions = x_positions
     ax.set_xticks(x_tick_positions)
     ax.set_xticklabels(all_x_values)
 
@@ -106,26 +105,38 @@ def plot_bar(data, folders, plot_info):
 
     ax.grid(True, linestyle='--', linewidth=0.5, alpha=0.7)
 
-    plt.show()
+    trace_draws(fig, "runtime.draw")
+    if show:
+        plt.show()
+    return fig
 
-def plot(data, folders, plot_info: PlotInfo, plot_type: PlotType):
+def plot(data, folders, plot_info: PlotInfo, plot_type: PlotType, show=True):
 
     if plot_type == PlotType.BAR_PLOT:
-        plot_bar(data, folders, plot_info)
-        return
+        return plot_bar(data, folders, plot_info, show)
 
-    plt.style.use('_mpl-gallery')
+    # the style only applies to this figure, batch workers render other plots in the same process afterwards
+    with plt.style.context('_mpl-gallery'):
+        fig = plot_points(data, folders, plot_info, plot_type)
 
+    trace_draws(fig, "runtime.draw")
+    if show:
+        plt.show()
+    return fig
+
+
+def plot_points(data, folders, plot_info: PlotInfo, plot_type: PlotType):
     folders = sorted(folders, key=sort_criteria)
     colors = map_folders_to_colors(folders)
 
     fig, ax = plt.subplots(figsize=(10, 4))
 
-    plotted_points = []
+    plotted_x, plotted_y, plotted_labels = [], [], []
+    scatters = {}
 
     for folder in folders:
-        x = np.array(data[folder]["value"])
-        y = np.array(data[folder]["time"])
+        x = data.values(folder)
+        y = data.first_times(folder)
 
         if plot_type == PlotType.STEM_PLOT:
             stem_container = ax.stem(
@@ -150,14 +161,18 @@ def plot(data, folders, plot_info: PlotInfo, plot_type: PlotType):
                 facecolors='none',
                 linewidth=2
             )
+            scatters[folder] = scatter
 
             ax.scatter([], [], marker=marker_style, edgecolors=colors[folder],
                        facecolors='none', s=80, linewidth=1.5, label=folder)
 
-    for xi, yi in zip(x, y):
-        plotted_points.append((xi, yi, folder))
+        plotted_x.append(x)
+        plotted_y.append(y)
+        plotted_labels.append([folder] * len(x))
 
-    ax.set_ylim(0, max([max(data[folder]["time"]) for folder in folders]) * 1.2)
+    # while a sweep is still running (watch mode) a folder can be without any finished run
+    max_time = data.max_time(folders)
+    ax.set_ylim(0, max_time * 1.2 if max_time > 0 else 1)
 
     num_x_ticks = max(5, int(fig.get_figwidth()))
     ax.xaxis.set_major_locator(MaxNLocator(nbins=num_x_ticks))
@@ -190,41 +205,70 @@ def plot(data, folders, plot_info: PlotInfo, plot_type: PlotType):
         annot.get_bbox_patch().set_facecolor(colors[label])
         annot.get_bbox_patch().set_alpha(0.8)
 
+    point_index = PointIndex(ax, np.concatenate(plotted_x), np.concatenate(plotted_y),
+                             [label for labels in plotted_labels for label in labels])
+    shown_point = [None]
+
+    # only redraw when the annotated point changes
     def hover(event):
-        if event.inaxes == ax:
-            for x, y, label in plotted_points:
-                distance = np.sqrt((x - event.xdata) ** 2 + (y - event.ydata) ** 2)
-                if distance < 1:
-                    update_annot((x, y), label)
-                    annot.set_visible(True)
-                    fig.canvas.draw_idle()
-                    return
-        annot.set_visible(False)
+        point = point_index.nearest(event.x, event.y) if event.inaxes == ax else None
+        if point == shown_point[0]:
+            return
+        shown_point[0] = point
+
+        if point is None:
+            annot.set_visible(False)
+        else:
+            update_annot(tuple(point_index.data[point]), point_index.labels[point])
+            annot.set_visible(True)
         fig.canvas.draw_idle()
 
     fig.canvas.mpl_connect("motion_notify_event", hover)
 
-    plt.show()
+    # watch mode appends the points of newly finished runs to these
+    fig.folder_scatters = scatters
+    fig.point_index = point_index
+    return fig
 
 
-def plot_runtime(base_path, plot_type: PlotType, folders = []):
-    yaml_file_name, yaml_file_path = find_yaml(base_path)
-    x_label = "Frequency" if "frequency" in base_path else "Iteration"
+# x_key / y_key plot other fields of the logs, e.g. x_key="cutoff" (see graph_utils.parse_slurm_fields),
+# workers / executor set the pool the logs are parsed on (see graph_utils.parse_slurm_files)
+def plot_runtime(base_path, plot_type: PlotType, folders = [], catalog=None, show=True, x_key=None, y_key=None,
+                 workers=None, executor="thread"):
+    if catalog is not None:
+        yaml_file_name, yaml_file_path = catalog.find_yaml(base_path)
+    else:
+        yaml_file_name, yaml_file_path = find_yaml(base_path)
+    x_label = x_key or ("Frequency" if "frequency" in base_path else "Iteration")
+    y_label = y_key or "Time"
 
-    title = x_label + " vs Time" + f" in {yaml_file_name}"
+    title = x_label + " vs " + y_label + f" in {yaml_file_name}"
 
     if len(folders) == 0:
-        folders = [f for f in os.listdir(base_path) if os.path.isdir(os.path.join(base_path, f))]
-
-    data = read_slurm( folders, base_path, False, False)
-
-    plot_info = PlotInfo(x_label, "Time(s)", title)
+        if catalog is not None:
+            folders = catalog.folders(base_path)
+        else:
+            fs = get_fs(base_path)
+            folders = [f for f in fs.listdir(base_path) if fs.isdir(os.path.join(base_path, f))]
+
+    try:
+        with span("runtime.read", base_path=base_path):
+            if catalog is not None:
+                data = catalog.read_slurm(folders, base_path, False, False, x_key, y_key, workers, executor)
+            else:
+                data = read_slurm( folders, base_path, False, False, workers=workers, executor=executor, x_key=x_key,
+                                  y_key=y_key)
+    except ValueError as e:
+        print(e)
+        return None
+
+    plot_info = PlotInfo(x_label, "Time(s)" if y_key is None else y_key, title)
 
     if folders == ["dynamicVLMerge", "fastParticleBuffer", "fastParticleBuffer_pt1", "fastParticleBuffer_pt2"]:
         data = merge_folders(data, "fastParticleBuffer_pt1", "fastParticleBuffer_pt2", "fastParticleBuffer (two-phase)")
         folders = ["fastParticleBuffer", "fastParticleBuffer (two-phase)", "dynamicVLMerge"]
 
-    plot(data, folders, plot_info, plot_type)
+    return plot(data, folders, plot_info, plot_type, show)
 
 
 
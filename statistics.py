@@ -1,4 +1,11 @@
-from graph_utils import PlotInfo, get_plotting_data, get_iterations, get_frequencies
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from graph_utils import PlotInfo, get_plotting_data, get_iterations, get_frequencies, extract_sorted_values, use_backend
+from profiling import span, trace_draws
+
+STATISTICS = ["mean", "sum", "median", "p95", "std"]
 
 
 def calculate_folderwise_averages_and_sums(base_path, folder_names, value, column_names, avg_window):
@@ -45,6 +52,61 @@ def calculate_folderwise_averages_and_sums(base_path, folder_names, value, colum
 
     return folder_stats  # Returning the dictionary for further use
 
+# mean, sum, median, p95 and std of every (folder, value, column) of a whole sweep as one tidy data frame
+# with the columns folder, value, column, mean, sum, median, p95, std.
+# every run is loaded once on a thread pool, all runs are then reduced together in one groupby
+def compute_sweep_statistics(base_path, folder_names, column_names, avg_window, values=None, catalog=None,
+                             workers=None):
+    mode = 0 if "frequency" in base_path else 1
+
+    runs = []
+    for folder_name in folder_names:
+        if values is not None:
+            folder_values = values
+        elif catalog is not None:
+            folder_values = catalog.extract_sorted_values(base_path, folder_name)
+        else:
+            folder_values = extract_sorted_values(os.path.join(base_path, folder_name))
+        runs.extend((folder_name, value) for value in folder_values)
+
+    def load(run):
+        folder_name, value = run
+        try:
+            return get_plotting_data(base_path, folder_name, value, column_names, mode, avg_window, catalog)
+        except Exception as e:
+            print(f"Error processing folder {folder_name} value {value}: {e}")
+            return None
+
+    with span("statistics.load", runs=len(runs)), ThreadPoolExecutor(max_workers=workers) as executor:
+        frames = list(executor.map(load, runs))
+
+    loaded = [(run, data[column_names]) for run, data in zip(runs, frames) if data is not None and not data.empty]
+    if not loaded:
+        return pd.DataFrame(columns=["folder", "value", "column"] + STATISTICS)
+
+    with span("statistics.aggregate", runs=len(loaded)):
+        data = pd.concat([frame for _, frame in loaded], keys=[run for run, _ in loaded],
+                         names=["folder", "value", "row"])
+        data = data.reset_index(level="row", drop=True)
+        data = data.melt(var_name="column", value_name="measurement", ignore_index=False).reset_index()
+
+        grouped = data.groupby(["folder", "value", "column"], sort=False)["measurement"]
+        stats = grouped.agg(["mean", "sum", "median", "std"])
+        stats["p95"] = grouped.quantile(0.95)
+
+    return stats.reset_index()[["folder", "value", "column"] + STATISTICS]
+
+
+# writes the statistics table for dashboards, the format follows the extension (.csv or .parquet)
+def export_statistics(stats, path):
+    if path.endswith(".parquet"):
+        stats.to_parquet(path, index=False)  # needs pyarrow or fastparquet
+    elif path.endswith(".csv"):
+        stats.to_csv(path, index=False)
+    else:
+        raise ValueError(f"Unknown export format of {path}, use .csv or .parquet")
+
+
 def compute_pairwise_differences(folder_stats):
     # Get all folder names
     folder_names = list(folder_stats.keys())
@@ -87,6 +149,110 @@ def compute_pairwise_differences(folder_stats):
     return total_difference
 
 
+# one statistic of the tidy table as a masked (folder, value, column) array,
+# runs that are missing (e.g. timeouts) are masked
+def stack_statistics(stats, statistic="mean", folders=None, values=None, columns=None):
+    folders = list(dict.fromkeys(stats["folder"])) if folders is None else list(folders)
+    values = sorted(set(stats["value"])) if values is None else list(values)
+    columns = list(dict.fromkeys(stats["column"])) if columns is None else list(columns)
+
+    index = pd.MultiIndex.from_product([folders, values, columns], names=["folder", "value", "column"])
+    array = stats.set_index(["folder", "value", "column"])[statistic].reindex(index).to_numpy(dtype=np.float64)
+    array = array.reshape(len(folders), len(values), len(columns))
+
+    return folders, values, columns, np.ma.masked_invalid(array)
+
+
+# differences[i, j, v, c] = stacked[i, v, c] - stacked[j, v, c] and speedups[i, j, v, c] = stacked[j] / stacked[i],
+# i.e. how much faster folder i is than folder j. a pair is masked if one of the two runs is missing
+def compute_difference_matrices(stacked):
+    rows = stacked[:, np.newaxis, :, :]
+    cols = stacked[np.newaxis, :, :, :]
+    differences = rows - cols
+    speedups = cols / np.ma.masked_equal(rows, 0)
+    return differences, speedups
+
+
+# the speedups averaged over all values both runs of a pair exist for, one folder x folder table per column.
+# entry (row, column) is how much faster the row folder is than the column folder
+def speedup_tables(folders, columns, speedups):
+    means = speedups.mean(axis=2)
+    return {column: pd.DataFrame(np.ma.filled(means[:, :, c], np.nan), index=folders, columns=folders)
+            for c, column in enumerate(columns)}
+
+
+# folders ordered from fastest (smallest statistic) to slowest for every value and column,
+# as a tidy data frame with the columns value, column, rank, folder, statistic. missing runs are not ranked
+def rank_folders(folders, values, columns, stacked):
+    order = np.ma.argsort(stacked, axis=0, endwith=True)
+    sorted_stats = np.take_along_axis(stacked, order, axis=0)
+
+    ranks, value_idx, column_idx = np.nonzero(~np.ma.getmaskarray(sorted_stats))
+    return pd.DataFrame({
+        "value": np.asarray(values)[value_idx],
+        "column": np.asarray(columns)[column_idx],
+        "rank": ranks + 1,
+        "folder": np.asarray(folders)[order[ranks, value_idx, column_idx]],
+        "statistic": sorted_stats.data[ranks, value_idx, column_idx],
+    }).sort_values(["column", "value", "rank"], ignore_index=True)
+
+
+# folder x folder heatmap of one column, averaged over all values both runs of a pair exist for
+def plot_difference_matrix(folders, matrix, title, label, show=True):
+    use_backend()
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(max(8, 3 + len(folders)), max(6, 2 + len(folders))))
+    cmap = plt.get_cmap('coolwarm').copy()
+    cmap.set_bad('lightgrey')
+
+    limit = np.ma.max(np.ma.abs(matrix)) if matrix.count() else 1
+    image = ax.imshow(matrix, cmap=cmap, vmin=-limit, vmax=limit)
+    colorbar = fig.colorbar(image, ax=ax)
+    colorbar.set_label(label, fontsize=12)
+
+    mask = np.ma.getmaskarray(matrix)
+    for i in range(len(folders)):
+        for j in range(len(folders)):
+            if not mask[i, j]:
+                ax.text(j, i, f"{matrix[i, j]:.3g}", ha="center", va="center", fontsize=9)
+
+    ax.set_xticks(range(len(folders)))
+    ax.set_xticklabels(folders, rotation=45, ha="right")
+    ax.set_yticks(range(len(folders)))
+    ax.set_yticklabels(folders)
+    ax.set_title(title, fontsize=14)
+    fig.tight_layout()
+
+    trace_draws(fig, "statistics.draw")
+    if show:
+        plt.show()
+    return fig
+
+
+# all pairs of folders compared over the whole sweep: the difference matrices, speedups and ranking of
+# the given statistic, and one difference heatmap (row - column) per column
+def compare_folders(base_path, folder_names, column_names, avg_window, statistic="mean", catalog=None, show=True):
+    stats = compute_sweep_statistics(base_path, folder_names, column_names, avg_window, catalog=catalog)
+    folders, values, columns, stacked = stack_statistics(stats, statistic, folder_names, columns=column_names)
+
+    differences, speedups = compute_difference_matrices(stacked)
+    ranking = rank_folders(folders, values, columns, stacked)
+
+    figures = []
+    for c, column in enumerate(columns):
+        matrix = differences[:, :, :, c].mean(axis=2)
+        figures.append(plot_difference_matrix(folders, matrix, f"{column} ({statistic}, row - column)",
+                                              f"Difference of the {statistic}", show=False))
+
+    if show:
+        use_backend()
+        import matplotlib.pyplot as plt
+        plt.show()
+
+    return differences, speedups, ranking, figures
+
+
 if __name__ == "__main__":
 
     base_path = "/home/xhulia/Desktop/Experiments/PercentageExperiments/spinodialDecomposition_equilibration_normal_temp/vlc_c08/frequency_tests"
@@ -97,4 +263,8 @@ if __name__ == "__main__":
 
     data = calculate_folderwise_averages_and_sums(base_path, folders, value , columns, avg_window)
 
+    # all values of the sweep at once
+    stats = compute_sweep_statistics(base_path, folders, columns, avg_window)
+    export_statistics(stats, "sweep_statistics.csv")
+
 
@@ -0,0 +1,116 @@
+import os
+import numpy as np
+from graph_utils import get_frequencies, get_iterations
+
+SCENARIO = "fallingDrop"
+CONTAINER = "vlc_c08"
+CSV_COLUMNS = ['Iteration', 'computeInteractions[ns]', 'remainderTraversal[ns]', 'rebuildNeighborLists[ns]',
+               'particleBufferSize', 'numberOfParticlesInContainer', 'numberFastParticles']
+NORMAL_FOLDERS = ["fastParticleBuffer", "dynamicVLMerge"]
+PERCENTAGE_FOLDERS = ["fastParticleBuffer0", "fastParticleBuffer01", "fastParticleBuffer001", "fastParticleBuffer0001",
+                      "fastParticleBuffer1", "fastParticleBuffer5", "fastParticleBuffer05", "dynamicVLMerge"]
+# iterations of the frequency tests / rebuild frequency of the iteration tests
+FIXED_ITERATIONS = 10000
+FIXED_FREQUENCY = 10
+
+YAML = """container                        :  [VerletListsCells]
+traversal                        :  [vlc_c08]
+verlet-rebuild-frequency         :  {frequency}
+iterations                       :  {iterations}
+functor                          :  Lennard-Jones (12-6)
+cutoff                           :  3
+box-min                          :  [0, 0, 0]
+box-max                          :  [7.25, 7.25, 7.25]
+"""
+
+# written into the root of every generated tree, only folders with it may be deleted by the benchmark
+MARKER_FILE = ".synthetic_tree"
+
+# filler lines between the header and the footer of a log, like the per-iteration progress output
+LOG_LINE = "Iteration {iteration:>8} : {progress:6.2f}% done, {particles} particles, {rebuilds} rebuilds\n"
+
+
+def write_slurm_out(path, test_type, value, time_ns, log_lines, rng, finished=True):
+    frequency, iterations = (value, FIXED_ITERATIONS) if test_type == "frequency" else (FIXED_FREQUENCY, value)
+
+    with open(path, "w") as f:
+        f.write(YAML.format(frequency=frequency, iterations=iterations))
+        f.write("\n")
+        particles = rng.integers(900, 1100, size=log_lines)
+        for i in range(log_lines):
+            f.write(LOG_LINE.format(iteration=i, progress=100 * i / max(1, log_lines), particles=particles[i],
+                                    rebuilds=i // frequency))
+        if finished:
+            f.write(f"\nTotal wall-clock time          : {time_ns} ns\n")
+            f.write(f"One iteration                  : {time_ns // iterations} ns\n")
+
+
+def write_csv(path, rows, rng):
+    columns = [np.arange(rows)]
+    columns.append(rng.normal(5000, 2000, rows).clip(1000).astype(np.int64))  # computeInteractions
+    columns.append(rng.normal(450, 100, rows).clip(50).astype(np.int64))  # remainderTraversal
+    columns.append(np.where(np.arange(rows) % 10 == 0, rng.integers(500, 2000, rows), rng.integers(0, 50, rows)))
+    buffer_size = rng.integers(0, 60, rows)
+    columns.append(buffer_size)
+    columns.append(1000 - buffer_size)
+    columns.append(rng.integers(0, 10, rows))
+
+    table = np.column_stack(columns)
+    np.savetxt(path, table, fmt="%d", delimiter=",", header=",".join(CSV_COLUMNS), comments="")
+
+
+# builds <root>/<category>/fallingDrop/vlc_c08/<test_type>_tests/<folder>/<test_type>_<value>/ with
+# `repeats` slurm logs (job_<value>.<slurm id>.out) and one per-iteration csv per sweep point.
+# num_values: the first values of get_frequencies() / get_iterations(), rows: csv rows per run (0: no csv),
+# log_lines: filler lines per log, unfinished: fraction of runs without footer (timeouts).
+# returns the base path (the *_tests folder)
+def generate_tree(root, category="NormalExperiments", test_type="frequency", folders=None, num_values=None,
+                  repeats=1, rows=1000, log_lines=100, unfinished=0.0, seed=0):
+    if test_type not in ("frequency", "iteration"):
+        raise ValueError(f"No such test type as {test_type}")
+    if folders is None:
+        folders = PERCENTAGE_FOLDERS if "Percentage" in category else NORMAL_FOLDERS
+
+    rng = np.random.default_rng(seed)
+    values = get_frequencies() if test_type == "frequency" else get_iterations()
+    if num_values is not None:
+        values = values[:num_values]
+
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, MARKER_FILE), "w") as f:
+        f.write("generated by synthetic_tree.py\n")
+
+    test_path = os.path.join(root, category, SCENARIO, CONTAINER)
+    base_path = os.path.join(test_path, f"{test_type}_tests")
+    os.makedirs(base_path, exist_ok=True)
+    with open(os.path.join(test_path, "input.yaml"), "w") as f:
+        f.write(YAML.format(frequency=FIXED_FREQUENCY, iterations=FIXED_ITERATIONS))
+
+    slurm_id = 1000
+    for folder in folders:
+        for value in values:
+            value_path = os.path.join(base_path, folder, f"{test_type}_{value}")
+            os.makedirs(value_path, exist_ok=True)
+
+            for _ in range(repeats):
+                time_ns = int(rng.normal(8e9, 1e9))
+                finished = rng.random() >= unfinished
+                write_slurm_out(os.path.join(value_path, f"job_{value}.{slurm_id}.out"), test_type, value, time_ns,
+                                log_lines, rng, finished)
+                slurm_id += 1
+
+            if rows > 0:
+                write_csv(os.path.join(value_path, "run.csv"), rows, rng)
+
+    return base_path
+
+
+def is_synthetic_tree(root):
+    return os.path.isfile(os.path.join(root, MARKER_FILE))
+
+
+if __name__ == "__main__":
+
+    root = "synthetic_experiments"
+    print(generate_tree(root, num_values=20, rows=10000))
+    print(generate_tree(root, "PercentageExperiments", num_values=10, repeats=5, rows=1000))
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from csv_io import load_windowed, pyramid_path, read_csv_chunked, CsvTail
+from graph_utils import process_csv
+from synthetic_tree import write_csv
+
+COLUMNS = ['Iteration', 'computeInteractions[ns]', 'remainderTraversal[ns]']
+
+
+# a run with duplicated and slightly out of order iterations, a row with a missing field and a truncated last line
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "run.csv"
+    write_csv(path, 2345, np.random.default_rng(0))
+    lines = path.read_text().splitlines(keepends=True)
+    header, rows = lines[0], lines[1:]
+    rows[100], rows[101] = rows[101], rows[100]
+    rows.insert(500, rows[400])
+    rows.insert(700, rows[700].rsplit(",", 1)[0] + ",\n")
+    path.write_text(header + "".join(rows) + rows[-1].rsplit(",", 2)[0])
+    return str(path)
+
+
+def assert_same_frame(frame, expected):
+    assert list(frame.columns) == list(expected.columns)
+    np.testing.assert_allclose(frame.to_numpy(dtype=np.float64), expected.to_numpy(dtype=np.float64), rtol=1e-12)
+
+
+@pytest.mark.parametrize("avg_window", [1, 7, 10, 100, 250, 5000])
+def test_pyramid_means_match_groupby(csv_path, avg_window):
+    expected = process_csv(csv_path, COLUMNS, avg_window)
+    # the first call builds the sidecar and pyramid, the second one reads them
+    assert_same_frame(load_windowed(csv_path, COLUMNS, avg_window), expected)
+    assert_same_frame(load_windowed(csv_path, COLUMNS, avg_window), expected)
+
+
+# the columns in another order share the pyramid, which does not repeat the rows of the sidecar
+def test_pyramid_shared_between_column_orders(csv_path):
+    load_windowed(csv_path, COLUMNS, 100)
+    reordered = COLUMNS[::-1]
+    assert pyramid_path(csv_path, reordered) == pyramid_path(csv_path, COLUMNS)
+    assert_same_frame(load_windowed(csv_path, reordered, 100), process_csv(csv_path, reordered, 100))
+
+    with np.load(pyramid_path(csv_path, COLUMNS)) as store:
+        assert not any(name.startswith("l0_") or name.endswith("_count") for name in store.files)
+
+
+@pytest.mark.parametrize("avg_window", [1, 10, 100])
+def test_chunked_matches_process_csv(csv_path, avg_window):
+    expected = process_csv(csv_path, COLUMNS, avg_window)
+    assert_same_frame(read_csv_chunked(csv_path, COLUMNS, avg_window, chunksize=97), expected)
+
+
+@pytest.mark.parametrize("avg_window", [1, 10, 100])
+def test_tail_matches_process_csv(csv_path, tmp_path, avg_window):
+    content = open(csv_path, "rb").read()
+    growing = tmp_path / "growing.csv"
+    growing.write_bytes(b"")
+    tail = CsvTail(str(growing), COLUMNS, avg_window)
+
+    # appended in pieces that end in the middle of lines
+    for end in list(range(0, len(content), 4099)) + [len(content)]:
+        growing.write_bytes(content[:end])
+        tail.update()
+
+    assert_same_frame(tail.result(), process_csv(csv_path, COLUMNS, avg_window))
@@ -0,0 +1,103 @@
+import os
+import re
+import numpy as np
+import pytest
+from graph_utils import read_slurm
+from run_table import RunTable
+from synthetic_tree import generate_tree
+
+
+# read_slurm as it was before the RunTable: {folder: {"value": [...], "time": [...]}}, every log read whole
+def read_slurm_dict(folders, base_path, is_percentage, is_distribution_plot):
+    data = {folder: {"value": [], "time": []} for folder in folders}
+    time_pattern = re.compile(r"Total wall-clock time\s+:\s+(\d+)\s+ns")
+    pattern = re.compile(r"verlet-rebuild-frequency\s+:\s+(\d+)")
+    value_pattern = re.compile(r"[a-zA-Z0-9_-]+_(\d+)\.(\d+)")
+
+    for folder in folders:
+        folder_path = os.path.join(base_path, folder)
+        for subfolder in os.listdir(folder_path):
+            subfolder_path = os.path.join(folder_path, subfolder)
+            files_to_process = os.listdir(subfolder_path)
+            if not is_percentage:
+                runs = [(int(match.group(2)), file) for file in files_to_process if file.endswith(".out")
+                        for match in [value_pattern.search(file)] if match]
+                files_to_process = [min(runs)[1]]
+
+            times = []
+            value = -1
+            for file in files_to_process:
+                if file.endswith(".out"):
+                    with open(os.path.join(subfolder_path, file)) as f:
+                        content = f.read()
+                    value_match, time_match = pattern.search(content), time_pattern.search(content)
+                    if value_match and time_match:
+                        value = int(value_match.group(1))
+                        times.append(int(time_match.group(1)) / 1e9)
+                        if not is_distribution_plot:
+                            data[folder]["value"].append(value)
+                            data[folder]["time"].append(times[-1])
+
+            if is_distribution_plot:
+                data[folder]["value"].append(value)
+                data[folder]["time"].append(times)
+
+    return data
+
+
+@pytest.fixture(scope="module")
+def trees(tmp_path_factory):
+    root = str(tmp_path_factory.mktemp("experiments"))
+    normal = generate_tree(root, "NormalExperiments", num_values=6, repeats=2, rows=0, log_lines=5, unfinished=0.2)
+    percentage = generate_tree(root, "PercentageExperiments", folders=["fastParticleBuffer0", "dynamicVLMerge"],
+                               num_values=6, repeats=4, rows=0, log_lines=5, unfinished=0.3)
+    return normal, percentage
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_runtime_table_matches_dict(trees, use_cache):
+    base_path = trees[0]
+    folders = ["fastParticleBuffer", "dynamicVLMerge"]
+    expected = read_slurm_dict(folders, base_path, False, False)
+    table = read_slurm(folders, base_path, False, False, use_cache)
+
+    for folder in folders:
+        assert sorted(zip(table.values(folder).tolist(), table.first_times(folder).tolist())) == \
+               sorted(zip(expected[folder]["value"], expected[folder]["time"]))
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_distribution_table_matches_dict(trees, use_cache):
+    base_path = trees[1]
+    folders = ["fastParticleBuffer0", "dynamicVLMerge"]
+    expected = read_slurm_dict(folders, base_path, True, True)
+    table = read_slurm(folders, base_path, True, True, use_cache)
+
+    for folder in folders:
+        points = sorted((value, sorted(times)) for value, times in zip(table.values(folder).tolist(),
+                                                                        map(list, table.repeats(folder))))
+        assert points == sorted((value, sorted(times)) for value, times
+                                in zip(expected[folder]["value"], expected[folder]["time"]))
+
+
+def test_sorted_and_select_keep_the_runs():
+    table = RunTable(["a", "b"], [1, 0, 0, 1], [20, 30, 10, 10], [0, 2, 3, 3, 6], [1., 2., 3., 4., 5., 6.])
+
+    ordered = table.sorted()
+    assert ordered.values("a").tolist() == [10, 30]
+    assert [times.tolist() for times in ordered.repeats("a")] == [[], [3.]]
+    assert [times.tolist() for times in ordered.repeats("b")] == [[4., 5., 6.], [1., 2.]]
+
+    selected = table.select(["b"])
+    assert selected.folders == ["b"]
+    assert np.isnan(ordered.first_times("a")[0])
+    assert sorted(selected.times.tolist()) == [1., 2., 4., 5., 6.]
+
+
+def test_lookup_finds_the_runs_of_a_point():
+    table = RunTable(["a", "b"], [1, 0, 0, 1], [20, 30, 10, 10], [0, 2, 3, 3, 6], [1., 2., 3., 4., 5., 6.])
+
+    assert table.lookup("b", 20).tolist() == [1., 2.]
+    assert table.lookup("a", 10).tolist() == []
+    assert table.lookup("b", 10).tolist() == [4., 5., 6.]
+    assert table.lookup("a", 20) is None
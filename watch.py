@@ -0,0 +1,242 @@
+import os
+import re
+import numpy as np
+from graph_utils import PlotInfo, SlurmCache, find_yaml, parse_slurm_files, slurm_patterns, slurm_file_pattern, \
+    list_folders
+from experiment_fs import get_fs, LOCAL_FS
+from run_table import RunTable
+from runtime_graph import plot as plot_runtime_data, PlotType as PlotTypeRuntime
+from distribution_graph import plot as plot_distribution_data, PlotType as PlotTypeDistribution
+import matplotlib.pyplot as plt
+
+POLL_INTERVAL_MS = 5000
+
+value_folder_pattern = re.compile(r'_(\d+)$')
+
+
+# incremental version of read_slurm for sweeps that are still running. the directories are polled instead of
+# watched with inotify, which does not see files written by other nodes of a cluster on a network file system.
+# a directory is only listed again if its mtime changed (an entry was added or removed) and only new .out files
+# and the logs of runs that have not finished yet are (re)parsed, so a poll costs as much as there is new output
+class SweepWatcher:
+    def __init__(self, base_path, folders, is_percentage, use_cache=True, workers=None):
+        if get_fs(base_path) is not LOCAL_FS:
+            raise ValueError(f"Watch mode needs a folder on disk, {base_path} is inside an archive")
+
+        self.base_path = base_path
+        self.folders = folders
+        self.is_percentage = is_percentage
+        self.workers = workers
+        self.pattern, self.time_pattern = slurm_patterns(base_path)
+        self.cache = SlurmCache(base_path) if use_cache else None
+
+        self.dir_mtimes = {}
+        self.value_dirs = {}  # value folder -> (folder, value)
+        # value folders in which a new .out file still changes the plot. without repetitions a value folder
+        # is done once its (oldest) run finished, with repetitions (percentage experiments) never
+        self.open_dirs = set()
+        self.dir_files = {}  # value folder -> names of the .out files seen in it
+        self.finished = {}  # .out file -> (folder, value, time in s)
+        self.running = {}  # .out file -> (folder, value, size, mtime_ns)
+
+    def changed(self, path):
+        mtime = os.stat(path).st_mtime_ns
+        if self.dir_mtimes.get(path) == mtime:
+            return False
+        self.dir_mtimes[path] = mtime
+        return True
+
+    def scan_folder(self, folder):
+        folder_path = os.path.join(self.base_path, folder)
+        if not self.changed(folder_path):
+            return
+
+        for name in os.listdir(folder_path):
+            path = os.path.join(folder_path, name)
+            match = value_folder_pattern.search(name)
+            if path in self.value_dirs or not match or not ("frequency" in name or "iteration" in name):
+                continue
+            if os.path.isdir(path):
+                self.value_dirs[path] = (folder, int(match.group(1)))
+                self.open_dirs.add(path)
+
+    # the .out files of a value folder that have not been looked at before
+    def scan_value_dir(self, dir_path):
+        if not self.changed(dir_path):
+            return []
+
+        seen = self.dir_files.setdefault(dir_path, set())
+        new_files = sorted(name for name in os.listdir(dir_path) if name.endswith(".out") and name not in seen)
+        seen.update(new_files)
+
+        if self.is_percentage:
+            return [os.path.join(dir_path, name) for name in new_files]
+
+        # like read_slurm, only the run with the smallest slurm id counts
+        runs = [(int(match.group(2)), name) for name in seen for match in [slurm_file_pattern.search(name)] if match]
+        if not runs:
+            return []
+        oldest = os.path.join(dir_path, min(runs)[1])
+        for path in list(self.running):
+            if os.path.dirname(path) == dir_path and path != oldest:
+                del self.running[path]
+        return [oldest] if os.path.basename(oldest) in new_files else []
+
+    # looks for new output and returns the newly finished runs as (folder, value, time in s)
+    def poll(self):
+        for folder in self.folders:
+            self.scan_folder(folder)
+
+        candidates = []
+        for dir_path in sorted(self.open_dirs):
+            candidates.extend(self.scan_value_dir(dir_path))
+
+        for path, (_, _, size, mtime_ns) in list(self.running.items()):
+            stat = os.stat(path)
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                candidates.append(path)
+
+        candidates = list(dict.fromkeys(candidates))
+        stats = [os.stat(path) for path in candidates]
+        parsed = parse_slurm_files(self.cache, candidates, self.pattern, self.time_pattern, self.workers)
+
+        new_runs = []
+        for path, stat, (value, time_ns) in zip(candidates, stats, parsed):
+            dir_path = os.path.dirname(path)
+            folder, dir_value = self.value_dirs[dir_path]
+
+            if time_ns is None:
+                self.running[path] = (folder, dir_value, stat.st_size, stat.st_mtime_ns)
+                continue
+
+            self.running.pop(path, None)
+            self.finished[path] = (folder, value, time_ns / 1e9)
+            new_runs.append(self.finished[path])
+            if not self.is_percentage:
+                self.open_dirs.discard(dir_path)
+
+        if self.cache is not None:
+            self.cache.save()
+
+        return new_runs
+
+    # (folder, value) of every run that has started but not finished yet
+    def running_runs(self):
+        return sorted(set((folder, value) for folder, value, _, _ in self.running.values()))
+
+    # the finished runs in the format of read_slurm
+    def data(self, is_distribution_plot):
+        folder_codes = {folder: i for i, folder in enumerate(self.folders)}
+
+        if not is_distribution_plot:
+            runs = sorted(self.finished.values())
+            return RunTable.from_runs(self.folders, [folder_codes[folder] for folder, _, _ in runs],
+                                      [value for _, value, _ in runs], [time_s for _, _, time_s in runs])
+
+        # every folder gets every value, so the groups of the distribution plot stay aligned
+        values = sorted(set(value for _, value in self.value_dirs.values()))
+        times = {(folder, value): [] for folder in self.folders for value in values}
+        for folder, value, time_s in self.finished.values():
+            times.setdefault((folder, value), []).append(time_s)
+
+        points = sorted(times, key=lambda point: (folder_codes[point[0]], point[1]))
+        counts = [len(times[point]) for point in points]
+        return RunTable(self.folders, [folder_codes[folder] for folder, _ in points], [value for _, value in points],
+                        np.concatenate([[0], np.cumsum(counts, dtype=np.int64)]),
+                        [time_s for point in points for time_s in times[point]])
+
+
+def update_running_markers(ax, markers, watcher):
+    running = watcher.running_runs()
+    offsets = np.array([(value, 0) for _, value in running], dtype=float).reshape(-1, 2)
+    markers.set_offsets(offsets)
+    if len(offsets):
+        ax.update_datalim(offsets)
+        ax.autoscale_view(scaley=False)
+
+
+# runtime scatter plot that grows while the sweep is running. runs that have started but not finished
+# are marked on the x-axis
+def watch_runtime(base_path, folders=[], interval_ms=POLL_INTERVAL_MS):
+    if len(folders) == 0:
+        folders = list_folders(base_path)
+
+    yaml_file_name, yaml_file_path = find_yaml(base_path)
+    x_label = "Frequency" if "frequency" in base_path else "Iteration"
+    plot_info = PlotInfo(x_label, "Time(s)", x_label + " vs Time" + f" in {yaml_file_name} (live)")
+
+    watcher = SweepWatcher(base_path, folders, False)
+    watcher.poll()
+
+    fig = plot_runtime_data(watcher.data(False), folders, plot_info, PlotTypeRuntime.SCATTER_PLOT, show=False)
+    ax = fig.axes[0]
+    markers = ax.scatter([], [], marker='x', color='gray', s=80, clip_on=False, zorder=3)
+    update_running_markers(ax, markers, watcher)
+
+    def refresh():
+        new_runs = watcher.poll()
+
+        for folder in folders:
+            points = np.array([(value, time_s) for f, value, time_s in new_runs if f == folder]).reshape(-1, 2)
+            if len(points) == 0:
+                continue
+            scatter = fig.folder_scatters[folder]
+            scatter.set_offsets(np.concatenate([scatter.get_offsets(), points]))
+            fig.point_index.extend(points[:, 0], points[:, 1], [folder] * len(points))
+            ax.update_datalim(points)
+
+        if new_runs:
+            ax.autoscale_view(scaley=False)
+            max_time = fig.point_index.data[:, 1].max()
+            if max_time * 1.2 > ax.get_ylim()[1]:
+                ax.set_ylim(0, max_time * 1.2)
+
+        update_running_markers(ax, markers, watcher)
+        fig.canvas.draw_idle()
+
+    timer = fig.canvas.new_timer(interval=interval_ms)
+    timer.add_callback(refresh)
+    timer.start()
+
+    plt.show()
+    return watcher
+
+
+# box / violin plot of repeated runs that is redrawn whenever runs finished
+def watch_distribution(base_path, plot_type: PlotTypeDistribution, folders=[], interval_ms=POLL_INTERVAL_MS):
+    if len(folders) == 0:
+        folders = list_folders(base_path)
+
+    yaml_file_name, yaml_file_path = find_yaml(base_path)
+    title = "Frequency" if "frequency" in base_path else "Iteration"
+    title = title + f" in {yaml_file_name} (live)"
+
+    watcher = SweepWatcher(base_path, folders, True)
+    watcher.poll()
+
+    def draw(ax=None):
+        running = len(watcher.running_runs())
+        return plot_distribution_data(watcher.data(True), folders, f"{title}, {running} runs still running",
+                                      plot_type, show=False, ax=ax)
+
+    fig = draw()
+
+    def refresh():
+        running = watcher.running_runs()
+        if watcher.poll() or watcher.running_runs() != running:
+            draw(fig.axes[0])
+            fig.canvas.draw_idle()
+
+    timer = fig.canvas.new_timer(interval=interval_ms)
+    timer.add_callback(refresh)
+    timer.start()
+
+    plt.show()
+    return watcher
+
+
+if __name__ == "__main__":
+
+    base_path = ""
+    folders = []
+    watch_runtime(base_path, folders)